@@ -1,5 +1,7 @@
 # backend/config.py
 import os
+import time
+import queue
 import logging
 import secrets # <--- NEW IMPORT
 from dotenv import load_dotenv
@@ -9,6 +11,9 @@ load_dotenv()
 
 # --- CONFIGURATION ---
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# Any OpenAI-compatible endpoint, e.g. the local stub: python -m benchmarks.stub_llm_server
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "deepseek/deepseek-chat")
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 
 SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_hex(32)
@@ -17,9 +22,81 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # Paths
-UPLOAD_DIR = "secure_uploads"
-DB_DIR = "chroma_db"
-SQLITE_DB = "legal_AIagent.db"
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "secure_uploads")
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))  # per /upload request; larger bodies get 413
+DB_DIR = os.getenv("DB_DIR", "chroma_db")
+LEXICAL_INDEX_DB = os.getenv("LEXICAL_INDEX_DB", os.path.join(DB_DIR, "lexical_index.db"))
+SQLITE_DB = os.getenv("SQLITE_DB", "legal_AIagent.db")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Ingestion Worker Pool
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))          # files processed at once
+INGEST_PARSE_PROCESSES = int(os.getenv("INGEST_PARSE_PROCESSES", "2"))  # Unstructured parse workers
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))            # chunks per embed/upsert call
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "40"))  # split PDFs at least this long
+PDF_PAGES_PER_RANGE = int(os.getenv("PDF_PAGES_PER_RANGE", "20"))        # pages per parse task
+
+# Embeddings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()   # "torch" (fp32) or "onnx" (int8, CPU)
+ONNX_EMBEDDING_PATH = os.getenv("ONNX_EMBEDDING_PATH", "models/all-MiniLM-L6-v2-onnx-int8")
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "embedding_cache.db")
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "4096"))  # query LRU
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", "500000"))    # chunk vectors on disk
+EMBEDDING_BATCHING = os.getenv("EMBEDDING_BATCHING", "true").lower() == "true"  # shared micro-batching worker
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+EMBEDDING_TORCH_THREADS = int(os.getenv("EMBEDDING_TORCH_THREADS", "0"))          # 0 = runtime default (torch or onnx)
+
+# Retrieval Result Cache
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "600"))
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "1024"))
+
+# Internal LLM Completion Cache ("record", "replay" = no network, or "off")
+LLM_CACHE_MODE = os.getenv("LLM_CACHE_MODE", "record").lower()
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+LLM_CACHE_MEMORY_MB = int(os.getenv("LLM_CACHE_MEMORY_MB", "32"))
+LLM_CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "512"))
+
+# Image Transcription (LLM Vision)
+VISION_MAX_DIMENSION = int(os.getenv("VISION_MAX_DIMENSION", "2048"))  # px on the long edge before sending
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "4"))        # vision calls in flight across all jobs
+TRANSCRIPTION_CACHE_DB = os.getenv("TRANSCRIPTION_CACHE_DB", "transcription_cache.db")
+
+# Web Search (compliance/citation tools)
+SEARCH_PROVIDER = os.getenv("SEARCH_PROVIDER", "serpapi")    # "serpapi" or "fixture" (offline)
+SEARCH_FIXTURES = os.getenv("SEARCH_FIXTURES", "benchmarks/fixtures/search_results.json")
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "8"))
+SEARCH_CACHE_DB = os.getenv("SEARCH_CACHE_DB", "search_cache.db")
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "86400"))
+
+# Chat History Window
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))              # recent turns sent verbatim
+HISTORY_SUMMARY_MAX_WORDS = int(os.getenv("HISTORY_SUMMARY_MAX_WORDS", "250"))     # cap for the rolling summary
+
+# Startup: warm models up in the background so /health/live answers immediately
+WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "true").lower() == "true"
+
+# Password Hashing: bcrypt runs on its own small thread pool, never on the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))      # bcrypt operations at once
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))  # waiting beyond that before a 503
+
+# Usernames allowed to call /admin endpoints (comma separated)
+ADMIN_USERS = [u.strip() for u in os.getenv("ADMIN_USERS", "admin").split(",") if u.strip()]
+
+# Request Traces: admins send "X-Trace: events|cpu|memory" to /analyze, fetch from /admin/traces/{id}
+TRACE_MAX_ENTRIES = int(os.getenv("TRACE_MAX_ENTRIES", "100"))        # most recent traces kept in memory
+TRACE_MAX_EVENTS = int(os.getenv("TRACE_MAX_EVENTS", "20000"))        # per trace; later events are only counted
+TRACE_SAMPLE_INTERVAL_MS = float(os.getenv("TRACE_SAMPLE_INTERVAL_MS", "5"))  # "cpu" stack sampling period
+
+# Audit Trail: log_audit only queues; backend/src/audit.py batch-writes one SQLite file per month
+AUDIT_DIR = os.getenv("AUDIT_DIR", "audit")
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "365"))     # monthly files older than this are deleted
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))           # pending records; beyond this they are dropped
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))             # records per insert transaction
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "1000"))
+AUDIT_MAX_DETAIL_CHARS = int(os.getenv("AUDIT_MAX_DETAIL_CHARS", "1000"))  # full queries don't belong in the audit trail
 
 # Create Directories
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -27,15 +104,19 @@ os.makedirs(DB_DIR, exist_ok=True)
 
 # --- LOGGING SETUP ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-audit_logger = logging.getLogger("audit")
-audit_logger.propagate = False
-audit_handler = logging.FileHandler('audit_trail.log')
-audit_formatter = logging.Formatter('%(asctime)s | USER:%(user)s | ACTION:%(action)s | DETAILS:%(message)s')
-audit_handler.setFormatter(audit_formatter)
-audit_logger.addHandler(audit_handler)
+
+# Drained by the audit writer (backend/src/audit.py), started with the app
+AUDIT_QUEUE = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+audit_dropped = {"count": 0}
 
 def log_audit(user: str, action: str, details: str):
-    audit_logger.info(details, extra={"user": user, "action": action})
+    """Never blocks the request: the record is queued, or dropped and counted if the writer is far behind."""
+    try:
+        AUDIT_QUEUE.put_nowait((time.time(), user, action, details[:AUDIT_MAX_DETAIL_CHARS]))
+    except queue.Full:
+        audit_dropped["count"] += 1
+        if audit_dropped["count"] % 1000 == 1:
+            logging.error(f"Audit queue full; {audit_dropped['count']} records dropped so far")
 
 if not OPENROUTER_API_KEY:
     logging.warning("⚠️ OPENROUTER_API_KEY is missing!")
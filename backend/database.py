@@ -1,42 +1,128 @@
 # backend/database.py
+import json
 import sqlite3
+import threading
 import uuid
 from datetime import datetime
-from backend.config import SQLITE_DB
+from backend.config import SQLITE_DB, SQLITE_BUSY_TIMEOUT_MS
+from backend.src.retrieval_cache import retrieval_cache
+
+# --- CONNECTION POOL ---
+# One long-lived connection per thread (request threads are reused by the
+# threadpool), opened in WAL mode so readers no longer queue behind writers.
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0  # bumped by close_connections so threads reopen instead of reusing closed handles
+
+def get_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = sqlite3.connect(SQLITE_DB, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        with _connections_lock:
+            _connections.append(conn)
+            _local.conn, _local.generation = conn, _generation
+    return conn
+
+def close_connections():
+    """Close every pooled connection (FastAPI shutdown)."""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+
+# --- SCHEMA ---
+
+def _add_content_columns(c):
+    # session_files rows point at the shared chunks through source_id
+    columns = [row[1] for row in c.execute("PRAGMA table_info(session_files)")]
+    if "source_id" not in columns:
+        c.execute("ALTER TABLE session_files ADD COLUMN source_id TEXT")
+    if "content_hash" not in columns:
+        c.execute("ALTER TABLE session_files ADD COLUMN content_hash TEXT")
+
+def _add_indexes(c):
+    # LangChain's SQLChatMessageHistory creates message_store lazily; declaring the same
+    # schema here lets us index it up front (create_all skips existing tables)
+    c.execute('''CREATE TABLE IF NOT EXISTS message_store
+                 (id INTEGER PRIMARY KEY, session_id TEXT, message TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username_created ON sessions(username, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_session_files_session ON session_files(session_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_message_store_session ON message_store(session_id)")
+
+def _add_history_summaries(c):
+    # Rolling summary of the turns that no longer fit in the chat_history token budget
+    c.execute('''CREATE TABLE IF NOT EXISTS history_summaries
+                 (session_id TEXT PRIMARY KEY, summary TEXT, summarized_count INTEGER, updated_at TEXT)''')
+
+def _add_session_keyset_index(c):
+    # (created_at, session_id) is the cursor for paginated session listing
+    c.execute("DROP INDEX IF EXISTS idx_sessions_username_created")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_username_created_id ON sessions(username, created_at, session_id)")
+
+def _add_ingest_checkpoints(c):
+    # One row per queued upload until it finishes; survives a crash so the job can resume
+    c.execute('''CREATE TABLE IF NOT EXISTS ingest_checkpoints
+                 (file_id TEXT PRIMARY KEY, job_id TEXT, username TEXT, session_id TEXT, filename TEXT,
+                  path TEXT, content_hash TEXT, chunks_stored INTEGER, updated_at TEXT)''')
+
+def _add_checkpoint_content_type(c):
+    # MIME type sniffed at upload, so the parser doesn't have to detect it again
+    c.execute("ALTER TABLE ingest_checkpoints ADD COLUMN content_type TEXT")
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    _add_content_columns,
+    _add_indexes,
+    _add_history_summaries,
+    _add_session_keyset_index,
+    _add_ingest_checkpoints,
+    _add_checkpoint_content_type,
+]
 
 def init_db():
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (username TEXT PRIMARY KEY, password_hash TEXT)''')
-    
-    # Updated Sessions Table
-    c.execute('''CREATE TABLE IF NOT EXISTS sessions
-                 (session_id TEXT PRIMARY KEY, username TEXT, title TEXT, created_at TEXT)''')
-    
-    # NEW: Files Table to track uploads per session
-    c.execute('''CREATE TABLE IF NOT EXISTS session_files
-                 (file_id TEXT PRIMARY KEY, session_id TEXT, filename TEXT, created_at TEXT)''')
-    
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (username TEXT PRIMARY KEY, password_hash TEXT)''')
+
+        # Updated Sessions Table
+        c.execute('''CREATE TABLE IF NOT EXISTS sessions
+                     (session_id TEXT PRIMARY KEY, username TEXT, title TEXT, created_at TEXT)''')
+
+        # NEW: Files Table to track uploads per session
+        c.execute('''CREATE TABLE IF NOT EXISTS session_files
+                     (file_id TEXT PRIMARY KEY, session_id TEXT, filename TEXT, created_at TEXT)''')
+
+        # Content-addressed uploads: one set of vector chunks per unique SHA-256
+        c.execute('''CREATE TABLE IF NOT EXISTS content_store
+                     (content_hash TEXT PRIMARY KEY, source_id TEXT, chunks INTEGER, ref_count INTEGER, created_at TEXT)''')
+
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        for step, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(c)
+            c.execute(f"PRAGMA user_version = {step}")
 
 # ... (Keep get_user_from_db and create_user_in_db as is) ...
 def get_user_from_db(username: str):
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("SELECT password_hash FROM users WHERE username = ?", (username,))
-    row = c.fetchone()
-    conn.close()
+    conn = get_connection()
+    row = conn.execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
     return row[0] if row else None
 
 def create_user_in_db(username: str, password_hash: str):
     try:
-        conn = sqlite3.connect(SQLITE_DB)
-        c = conn.cursor()
-        c.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-        conn.commit()
-        conn.close()
+        conn = get_connection()
+        with conn:
+            conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
         return True
     except sqlite3.IntegrityError:
         return False
@@ -46,62 +132,239 @@ def create_user_in_db(username: str, password_hash: str):
 def create_session_db(username: str, title: str):
     session_id = str(uuid.uuid4())
     created_at = datetime.now().isoformat()
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("INSERT INTO sessions VALUES (?, ?, ?, ?)", (session_id, username, title, created_at))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute("INSERT INTO sessions VALUES (?, ?, ?, ?)", (session_id, username, title, created_at))
     return session_id, created_at
 
-def get_user_sessions(username: str):
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("SELECT session_id, title, created_at FROM sessions WHERE username = ? ORDER BY created_at DESC", (username,))
-    rows = c.fetchall()
-    conn.close()
+def get_user_sessions(username: str, before: str = None, limit: int = None):
+    """
+    Newest first. `before` is the session_id of the last session already seen;
+    only sessions older than it are returned (keyset pagination).
+    """
+    query = "SELECT session_id, title, created_at FROM sessions WHERE username = ?"
+    params = [username]
+    if before:
+        query += (" AND (created_at, session_id) < "
+                  "(SELECT created_at, session_id FROM sessions WHERE session_id = ? AND username = ?)")
+        params += [before, username]
+    query += " ORDER BY created_at DESC, session_id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    conn = get_connection()
+    rows = conn.execute(query, params).fetchall()
     return [{"session_id": r[0], "title": r[1], "created_at": r[2]} for r in rows]
 
 def update_session_title_db(session_id: str, new_title: str):
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("UPDATE sessions SET title = ? WHERE session_id = ?", (new_title, session_id))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE sessions SET title = ? WHERE session_id = ?", (new_title, session_id))
 
 def delete_session_db(session_id: str, username: str):
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("DELETE FROM sessions WHERE session_id = ? AND username = ?", (session_id, username))
-    c.execute("DELETE FROM session_files WHERE session_id = ?", (session_id,))
-    # LangChain history cleanup
-    try:
+    """
+    Deletes the session and its file references. Returns source_ids no longer referenced
+    anywhere, or None when the user owns no such session (nothing is touched).
+    """
+    conn = get_connection()
+    with conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM sessions WHERE session_id = ? AND username = ?", (session_id, username))
+        if c.rowcount == 0:
+            return None
+        c.execute("SELECT file_id FROM session_files WHERE session_id = ?", (session_id,))
+        released = [_release_file(c, r[0]) for r in c.fetchall()]
+        # LangChain history cleanup
         c.execute("DELETE FROM message_store WHERE session_id = ?", (session_id,))
-    except:
-        pass
-    conn.commit()
-    conn.close()
+        c.execute("DELETE FROM history_summaries WHERE session_id = ?", (session_id,))
+    released = [r for r in released if r]
+    retrieval_cache.invalidate_sources([source_id for source_id, _ in released])
+    return [source_id for source_id, orphaned in released if orphaned]
+
+def get_history_summary_db(session_id: str):
+    """Returns (summary, number of leading messages it covers); ("", 0) if none yet."""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT summary, summarized_count FROM history_summaries WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    return (row[0], row[1]) if row else ("", 0)
+
+def save_history_summary_db(session_id: str, summary: str, summarized_count: int):
+    # Only move forward: a concurrent request that summarized further wins
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            """INSERT INTO history_summaries VALUES (?, ?, ?, ?)
+               ON CONFLICT(session_id) DO UPDATE SET
+                   summary = excluded.summary,
+                   summarized_count = excluded.summarized_count,
+                   updated_at = excluded.updated_at
+               WHERE excluded.summarized_count > history_summaries.summarized_count""",
+            (session_id, summary, summarized_count, datetime.now().isoformat()),
+        )
+
+# --- CHAT HISTORY ---
+# Read message_store (written by LangChain's SQLChatMessageHistory) directly, so
+# a page of history costs one indexed range scan instead of loading every message.
+
+def _message_row(row):
+    message = json.loads(row[1])
+    role = "user" if message.get("type") == "human" else "assistant"
+    return {"id": row[0], "role": role, "content": message.get("data", {}).get("content", "")}
+
+def get_session_messages_db(session_id: str, before: int = None, limit: int = None):
+    """Messages in chronological order; with `limit`, only the newest `limit` older than message id `before`."""
+    query = "SELECT id, message FROM message_store WHERE session_id = ?"
+    params = [session_id]
+    if before is not None:
+        query += " AND id < ?"
+        params.append(before)
+    query += " ORDER BY id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    rows = get_connection().execute(query, params).fetchall()
+    return [_message_row(r) for r in reversed(rows)]
+
+def iter_session_messages_db(session_id: str, batch_size: int = 500):
+    """Yields every message in order, one indexed batch at a time (no cursor is held between batches)."""
+    after = -1
+    while True:
+        rows = get_connection().execute(
+            "SELECT id, message FROM message_store WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (session_id, after, batch_size),
+        ).fetchall()
+        for row in rows:
+            yield _message_row(row)
+        if len(rows) < batch_size:
+            return
+        after = rows[-1][0]
 
 # --- FILE MANAGEMENT (NEW) ---
 
 def add_file_to_session_db(session_id: str, filename: str, file_id: str):
     created_at = datetime.now().isoformat()
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("INSERT INTO session_files VALUES (?, ?, ?, ?)", (file_id, session_id, filename, created_at))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO session_files (file_id, session_id, filename, created_at, source_id) VALUES (?, ?, ?, ?, ?)",
+            (file_id, session_id, filename, created_at, file_id)
+        )
+    retrieval_cache.invalidate_sources([file_id])
 
 def get_session_files_db(session_id: str):
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
-    c.execute("SELECT file_id, filename FROM session_files WHERE session_id = ?", (session_id,))
-    rows = c.fetchall()
-    conn.close()
-    return [{"file_id": r[0], "filename": r[1]} for r in rows]
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT file_id, filename, COALESCE(source_id, file_id) FROM session_files WHERE session_id = ?", (session_id,)
+    ).fetchall()
+    return [{"file_id": r[0], "filename": r[1], "source_id": r[2]} for r in rows]
 
 def delete_file_db(file_id: str):
-    conn = sqlite3.connect(SQLITE_DB)
-    c = conn.cursor()
+    """Removes one session reference. Returns the source_id if its chunks are now unreferenced."""
+    conn = get_connection()
+    with conn:
+        released = _release_file(conn.cursor(), file_id)
+    if not released:
+        return None
+    source_id, orphaned = released
+    retrieval_cache.invalidate_sources([source_id])
+    return source_id if orphaned else None
+
+def _release_file(c, file_id: str):
+    """Deletes a session_files row. Returns (source_id, orphaned) or None if there was no row."""
+    c.execute("SELECT COALESCE(source_id, file_id), content_hash FROM session_files WHERE file_id = ?", (file_id,))
+    row = c.fetchone()
+    if not row:
+        return None
+    source_id, content_hash = row
     c.execute("DELETE FROM session_files WHERE file_id = ?", (file_id,))
-    conn.commit()
-    conn.close()
+
+    # Legacy uploads have no content record: their chunks belong to this file alone
+    if not content_hash:
+        return source_id, True
+
+    c.execute("UPDATE content_store SET ref_count = ref_count - 1 WHERE content_hash = ?", (content_hash,))
+    c.execute("SELECT ref_count FROM content_store WHERE content_hash = ?", (content_hash,))
+    ref = c.fetchone()
+    if ref and ref[0] > 0:
+        return source_id, False
+    c.execute("DELETE FROM content_store WHERE content_hash = ?", (content_hash,))
+    return source_id, True
+
+# --- CONTENT-ADDRESSED STORE ---
+
+def get_content_db(content_hash: str):
+    conn = get_connection()
+    row = conn.execute("SELECT source_id, chunks FROM content_store WHERE content_hash = ?", (content_hash,)).fetchone()
+    return {"source_id": row[0], "chunks": row[1]} if row else None
+
+def attach_content_db(session_id: str, filename: str, file_id: str, content_hash: str, source_id: str = None, chunks: int = 0):
+    """
+    Links an upload to the content record for `content_hash` and takes a reference on it.
+    If no record exists, one is created from `source_id`/`chunks`; without a source_id
+    nothing is written and None is returned. Otherwise returns the record
+    ({'source_id', 'chunks'}), which may belong to an earlier identical upload.
+    """
+    created_at = datetime.now().isoformat()
+    conn = get_connection()
+    with conn:
+        c = conn.cursor()
+        # The UPDATE takes the write lock, so a concurrent delete cannot drop the record under us
+        c.execute("UPDATE content_store SET ref_count = ref_count + 1 WHERE content_hash = ?", (content_hash,))
+        if c.rowcount == 0:
+            if not source_id:
+                return None
+            c.execute(
+                "INSERT INTO content_store VALUES (?, ?, ?, 1, ?)",
+                (content_hash, source_id, chunks, created_at)
+            )
+        c.execute("SELECT source_id, chunks FROM content_store WHERE content_hash = ?", (content_hash,))
+        record = c.fetchone()
+        c.execute(
+            "INSERT INTO session_files (file_id, session_id, filename, created_at, source_id, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            (file_id, session_id, filename, created_at, record[0], content_hash)
+        )
+    retrieval_cache.invalidate_sources([record[0]])
+    return {"source_id": record[0], "chunks": record[1]}
+
+# --- INGESTION CHECKPOINTS ---
+
+def save_ingest_checkpoints_db(job_id: str, username: str, session_id: str, files: list):
+    """Record queued files ({'file_id', 'filename', 'path', 'content_hash', 'content_type'}) before any work starts."""
+    updated_at = datetime.now().isoformat()
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO ingest_checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?, ?)",
+            [(f["file_id"], job_id, username, session_id, f["filename"], f["path"], f["content_hash"],
+              updated_at, f.get("content_type")) for f in files],
+        )
+
+def advance_ingest_checkpoint_db(file_id: str, chunks: int):
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE ingest_checkpoints SET chunks_stored = chunks_stored + ?, updated_at = ? WHERE file_id = ?",
+            (chunks, datetime.now().isoformat(), file_id),
+        )
+
+def get_ingest_checkpoint_db(file_id: str):
+    """Chunks already stored for `file_id`, 0 if there is no checkpoint."""
+    conn = get_connection()
+    row = conn.execute("SELECT chunks_stored FROM ingest_checkpoints WHERE file_id = ?", (file_id,)).fetchone()
+    return row[0] if row else 0
+
+def clear_ingest_checkpoint_db(file_id: str):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM ingest_checkpoints WHERE file_id = ?", (file_id,))
+
+def get_pending_ingests_db():
+    """Checkpoints left by a previous process, oldest job first."""
+    conn = get_connection()
+    rows = conn.execute(
+        """SELECT file_id, job_id, username, session_id, filename, path, content_hash, content_type, chunks_stored
+           FROM ingest_checkpoints ORDER BY updated_at, rowid"""
+    ).fetchall()
+    keys = ("file_id", "job_id", "user", "session_id", "filename", "path", "content_hash", "content_type", "chunks_stored")
+    return [dict(zip(keys, row)) for row in rows]
@@ -1,17 +1,46 @@
 # backend/main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-from backend.database import init_db
-from backend.routers import auth, sessions, documents, chat
-
-init_db()
+from backend.database import init_db, close_connections
+from backend.config import WARMUP_IN_BACKGROUND
+from backend.routers import auth, sessions, documents, chat, jobs, admin, health, metrics
+from backend.src.ingestion import start_workers, shutdown_workers, resume_interrupted_jobs
+from backend.src.vector_store import close_vector_store
+from backend.src.web_search import close_web_search
+from backend.src.warmup import warm_up
+from backend.src.core import get_embedding_service, get_vision_service, is_loaded
+from backend.src.audit import audit_writer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    audit_writer.start()
+    # Load models ahead of the first request; /health/ready reports progress
+    if WARMUP_IN_BACKGROUND:
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    else:
+        await asyncio.to_thread(warm_up)
+    start_workers()
+    resume_interrupted_jobs()
+    yield
+    shutdown_workers()
+    if get_embedding_service():
+        get_embedding_service().close()
+    if is_loaded("vision"):
+        get_vision_service().close()
+    await close_web_search()
+    close_vector_store()
+    close_connections()
+    audit_writer.stop()  # last, so shutdown-time records are written too
 
 limiter = Limiter(key_func=get_remote_address)
-app = FastAPI(title="Legal AI Agent API", version="3.0")
+app = FastAPI(title="Legal AI Agent API", version="3.0", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -30,6 +59,10 @@ app.include_router(auth.router)
 app.include_router(sessions.router)
 app.include_router(documents.router)
 app.include_router(chat.router)
+app.include_router(jobs.router)
+app.include_router(admin.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     import uvicorn
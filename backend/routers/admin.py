@@ -0,0 +1,86 @@
+# backend/routers/admin.py
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from starlette.concurrency import run_in_threadpool
+
+from backend.security import get_admin_user
+from backend.config import AUDIT_DIR, log_audit, audit_dropped
+from backend.src.audit import audit_writer, query_audit
+from backend.src.core import get_embeddings, get_completion_cache, get_embedding_service, get_vision_service, is_loaded
+from backend.src.agent import get_history_window
+from backend.src.retrieval_cache import retrieval_cache
+from backend.src.web_search import get_web_search
+from backend.src.tracing import trace_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+MAX_AUDIT_PAGE_SIZE = 1000
+
+def _epoch(value: Optional[datetime]):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # naive times are UTC, like the stored ones
+    return value.timestamp()
+
+@router.get("/cache-stats")
+async def cache_stats(user: str = Depends(get_admin_user)):
+    """
+    Cache hit ratios and sizes (for tuning TTL/max entries), embedding batch and queue
+    histograms, image transcription payload sizes and cache hits, and audit writer backlog.
+    """
+    completion_cache = get_completion_cache()
+    embedding_service = get_embedding_service()
+    web_search = get_web_search()
+    return {
+        "retrieval": retrieval_cache.stats(),
+        # Not loaded yet (before warm-up): report nothing rather than loading the model here
+        "embeddings": get_embeddings().stats() if is_loaded("embeddings") else None,
+        "embedding_service": embedding_service.stats() if embedding_service else None,
+        "history": get_history_window().stats(),
+        "search": web_search.stats() if web_search else None,
+        "completions": completion_cache.stats() if completion_cache else None,
+        "vision": get_vision_service().stats() if is_loaded("vision") else None,
+        "audit": {**audit_writer.stats(), "dropped": audit_dropped["count"]},
+    }
+
+@router.get("/traces")
+async def list_traces(user: str = Depends(get_admin_user)):
+    """Recent /analyze traces, newest first (see the X-Trace header)."""
+    return trace_store.list()
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str, user: str = Depends(get_admin_user)):
+    """One trace: the run waterfall, every stream event, and the CPU/memory profile if requested."""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace.to_dict()
+
+@router.get("/audit")
+async def audit_records(
+    response: Response,
+    username: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=MAX_AUDIT_PAGE_SIZE),
+    user: str = Depends(get_admin_user),
+):
+    """
+    Audit records, newest first, filtered by user, action and time range [since, until).
+    Pass the X-Next-Cursor header back as `before` for the next page.
+    """
+    try:
+        records, next_cursor = await run_in_threadpool(
+            query_audit, AUDIT_DIR, username=username, action=action,
+            since=_epoch(since), until=_epoch(until), before=before, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    log_audit(user, "AUDIT_QUERY", f"username={username} action={action} since={since} until={until}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return records
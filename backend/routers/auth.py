@@ -3,14 +3,14 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from backend.schemas import UserModel
 from backend.database import create_user_in_db, get_user_from_db
-from backend.security import get_password_hash, verify_password, create_access_token
+from backend.security import hash_password_async, verify_password_async, create_access_token
 from backend.config import log_audit
 
 router = APIRouter()
 
 @router.post("/register")
 async def register(user: UserModel):
-    hash_pw = get_password_hash(user.password)
+    hash_pw = await hash_password_async(user.password)
     if create_user_in_db(user.username, hash_pw):
         log_audit(user.username, "REGISTER", "User registered successfully")
         return {"msg": "Created"}
@@ -24,7 +24,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         return {"access_token": token, "token_type": "bearer"}
 
     hashed_pw = get_user_from_db(form_data.username)
-    if not hashed_pw or not verify_password(form_data.password, hashed_pw):
+    if not hashed_pw or not await verify_password_async(form_data.password, hashed_pw):
         log_audit(form_data.username, "LOGIN_FAILED", "Invalid credentials")
         raise HTTPException(status_code=400, detail="Invalid username or password")
     
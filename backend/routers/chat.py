@@ -1,4 +1,5 @@
 # backend/routers/chat.py
+import time
 import logging
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
@@ -6,29 +7,43 @@ from starlette.concurrency import run_in_threadpool # To run sync DB calls safel
 
 from backend.security import get_current_user
 from backend.schemas import QueryRequest
-from backend.config import log_audit
-from backend.src.agent import agent_executor, get_session_history # Import executor directly
+from backend.config import log_audit, ADMIN_USERS
+from backend.src.agent import get_agent_executor, get_session_history, get_history_window
 from backend.src.context_vars import session_context 
+from backend.src.metrics import EventTimer, STAGE_SECONDS, ACTIVE_STREAMS, STREAMS_TOTAL
+from backend.src.tracing import TRACE_HEADER, RequestTrace, parse_trace_header, trace_store
 
 router = APIRouter(tags=["chat"])
 
-async def async_stream_generator(query: str, session_id: str):
+async def async_stream_generator(query: str, session_id: str, trace: RequestTrace = None):
     token = session_context.set(session_id)
-    
-    # 1. Load History Synchronously (Safe DB Access)
-    history = await run_in_threadpool(get_session_history, session_id)
-    chat_history = await run_in_threadpool(lambda: history.messages)
-    
     full_response = ""
     
     # --- BUFFERING STATE ---
     # We hold text here until we know if it's a preamble ("To determine...") or a real answer
     pre_tool_buffer = "" 
     tool_has_started = False
+    timer = EventTimer()  # LLM first-token/total and tool latencies for /metrics
+    STREAMS_TOTAL.inc()
+    ACTIVE_STREAMS.inc()
+    error = None
+    if trace:
+        trace.start()  # from here on the trace is always finished, even if history loading fails
     
     try:
+        # 1. Load History Synchronously (Safe DB Access)
+        started = time.perf_counter()
+        history = await run_in_threadpool(get_session_history, session_id)
+        stored_messages = await run_in_threadpool(lambda: history.messages)
+        STAGE_SECONDS.labels("history_load").observe(time.perf_counter() - started)
+        if trace:
+            trace.mark("history_load", duration_ms=round((time.perf_counter() - started) * 1000, 3),
+                       messages=len(stored_messages))
+        # Only the recent turns within HISTORY_TOKEN_BUDGET (plus a summary of older ones) go to the LLM
+        chat_history = await get_history_window().prepare(session_id, stored_messages)
+
         # 2. Stream from the Agent Executor Directly (Async)
-        async for event in agent_executor.astream_events(
+        async for event in get_agent_executor().astream_events(
             {
                 "input": query, 
                 "chat_history": chat_history
@@ -36,6 +51,9 @@ async def async_stream_generator(query: str, session_id: str):
             config={"configurable": {"session_id": session_id}},
             version="v2"
         ):
+            timer.observe(event)
+            if trace:
+                trace.record(event)
             kind = event["event"]
             tags = event.get("tags", [])
 
@@ -93,20 +111,37 @@ async def async_stream_generator(query: str, session_id: str):
 
         # 4. Save History Manually (Sync DB Access)
         if full_response.strip():
+            started = time.perf_counter()
             await run_in_threadpool(history.add_user_message, query)
             await run_in_threadpool(history.add_ai_message, full_response)
+            STAGE_SECONDS.labels("history_save").observe(time.perf_counter() - started)
+            if trace:
+                trace.mark("history_save", duration_ms=round((time.perf_counter() - started) * 1000, 3),
+                           response_chars=len(full_response))
 
     except Exception as e:
         logging.error(f"Stream Error for session {session_id}: {e}")
+        error = repr(e)
         yield f"\n[System Error]: {str(e)}"
         
     finally:
+        ACTIVE_STREAMS.dec()
+        if trace:
+            trace.finish(error)
         session_context.reset(token)
 
 @router.post("/analyze")
 async def analyze(request: Request, q: QueryRequest, user: str = Depends(get_current_user)):
     log_audit(user, "ANALYZE", f"Session: {q.session_id} | Query: {q.query}")
+    # Admins can ask for a trace of this request; the header is ignored for everyone else
+    trace = None
+    modes = parse_trace_header(request.headers.get(TRACE_HEADER))
+    if modes and user in ADMIN_USERS:
+        trace = RequestTrace(user, q.session_id, q.query, modes)
+        trace_store.add(trace)
+        log_audit(user, "TRACE", f"Trace {trace.trace_id} ({', '.join(trace.modes)})")
     return StreamingResponse(
-        async_stream_generator(q.query, q.session_id), 
-        media_type="text/plain"
+        async_stream_generator(q.query, q.session_id, trace), 
+        media_type="text/plain",
+        headers={"X-Trace-ID": trace.trace_id} if trace else None
     )
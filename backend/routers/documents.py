@@ -1,15 +1,14 @@
 # backend/routers/documents.py
 import os
-import shutil
-from uuid import uuid4
 from typing import List
-from fastapi import APIRouter, UploadFile, File, Depends, Request
+from fastapi import APIRouter, Depends, Request, HTTPException
 
-from backend.config import UPLOAD_DIR, log_audit
-from backend.database import add_file_to_session_db, get_session_files_db, delete_file_db
+from backend.config import UPLOAD_DIR, MAX_UPLOAD_MB, log_audit
+from backend.database import get_session_files_db, delete_file_db, attach_content_db
 from backend.security import get_current_user
 from backend.schemas import FileResponse
-from backend.src.document_processor import process_document
+from backend.src.ingestion import create_job, submit_job
+from backend.src.upload_stream import receive_uploads, UploadTooLarge, UploadFormatError
 from backend.src.vector_store import delete_from_vector_store
 
 router = APIRouter(tags=["documents"])
@@ -20,42 +19,71 @@ async def list_files(session_id: str, user: str = Depends(get_current_user)):
 
 @router.delete("/sessions/{session_id}/files/{file_id}")
 async def delete_file(session_id: str, file_id: str, user: str = Depends(get_current_user)):
-    delete_from_vector_store(file_id)
-    delete_file_db(file_id)
+    # Chunks are shared between identical uploads; only purge them with the last reference
+    orphaned_source_id = delete_file_db(file_id)
+    if orphaned_source_id:
+        delete_from_vector_store(orphaned_source_id)
     return {"status": "deleted"}
 
-@router.post("/upload")
+# Documented by hand: the body is parsed by receive_uploads, not by FastAPI
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+        "required": ["files"],
+    }}},
+}
+
+@router.post("/upload", status_code=202, openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
 async def upload_docs(
-    request: Request, 
-    files: List[UploadFile] = File(...), 
+    request: Request,
     session_id: str = "default",
     user: str = Depends(get_current_user)
 ):
+    """
+    Stream the files to disk and queue them for background ingestion. Poll GET /jobs/{job_id}
+    for progress. Bodies over MAX_UPLOAD_MB are rejected with 413 without being read in full.
+    """
+    try:
+        # Hashed and MIME-sniffed while the bytes stream to disk, so nothing re-reads them
+        saved = await receive_uploads(request, UPLOAD_DIR, MAX_UPLOAD_MB * 1024 * 1024)
+    except UploadTooLarge as e:
+        log_audit(user, "UPLOAD_ERROR", str(e))
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_MB} MB")
+    except UploadFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     results = []
-    for file in files:
-        file_uuid = str(uuid4())
-        ext = os.path.splitext(file.filename)[1]
-        safe_name = f"{file_uuid}{ext}"
-        path = os.path.join(UPLOAD_DIR, safe_name)
-        
+    queued = []
+    for upload in saved:
+        filename, file_uuid, path = upload["filename"], upload["file_id"], upload["path"]
         try:
-            with open(path, "wb") as f:
-                shutil.copyfileobj(file.file, f)
-            
-            chunks = process_document(path, file_uuid)
-            
-            if chunks > 0:
-                add_file_to_session_db(session_id, file.filename, file_uuid)
-
-            results.append({
-                "filename": file.filename, "file_id": file_uuid,
-                "chunks": chunks, "status": "Success"
+            content_hash = upload["content_hash"]
+            existing = attach_content_db(session_id, filename, file_uuid, content_hash)
+            if existing:
+                os.remove(path)
+                results.append({
+                    "filename": filename, "file_id": file_uuid,
+                    "chunks": existing["chunks"], "status": "Success", "deduplicated": True
+                })
+                log_audit(user, "UPLOAD", f"Linked {filename} to existing content {content_hash[:12]}")
+                continue
+
+            queued.append({
+                "file_id": file_uuid, "filename": filename, "path": path,
+                "content_hash": content_hash, "content_type": upload["content_type"],
             })
-            log_audit(user, "UPLOAD", f"Processed {file.filename}")
-            
+            results.append({"filename": filename, "file_id": file_uuid, "status": "Queued"})
+
         except Exception as e:
-            results.append({"filename": file.filename, "status": "Error", "detail": str(e)})
-            log_audit(user, "UPLOAD_ERROR", f"Failed {file.filename}: {str(e)}")
+            results.append({"filename": filename, "status": "Error", "detail": str(e)})
+            log_audit(user, "UPLOAD_ERROR", f"Failed {filename}: {str(e)}")
             if os.path.exists(path): os.remove(path)
 
-    return {"uploaded": results}
\ No newline at end of file
+    job_id = None
+    if queued:
+        job_id = create_job(user, session_id, queued)
+        submit_job(job_id)
+
+    return {"job_id": job_id, "uploaded": results}
@@ -0,0 +1,18 @@
+# backend/routers/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from backend.src.warmup import warmup_state
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def liveness():
+    """The process is up and serving; says nothing about the models."""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness():
+    """200 once warm-up has loaded the models, agent and vector store; 503 before that or on failure."""
+    state = warmup_state()
+    return JSONResponse(state, status_code=200 if state["status"] == "ready" else 503)
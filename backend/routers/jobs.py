@@ -0,0 +1,38 @@
+# backend/routers/jobs.py
+import json
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from backend.security import get_current_user
+from backend.src.ingestion import get_job, TERMINAL_STATES
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+POLL_INTERVAL_SECONDS = 0.5
+
+def _get_owned_job(job_id: str, user: str):
+    job = get_job(job_id)
+    if not job or job["user"] != user:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}")
+async def job_status(job_id: str, user: str = Depends(get_current_user)):
+    return _get_owned_job(job_id, user)
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, user: str = Depends(get_current_user)):
+    """Stream job snapshots as NDJSON each time progress changes, until the job finishes."""
+    job = _get_owned_job(job_id, user)
+
+    async def event_stream(job):
+        yield json.dumps(job) + "\n"
+        while job and job["status"] not in TERMINAL_STATES:
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            latest = get_job(job_id)
+            if latest and latest["version"] != job["version"]:
+                yield json.dumps(latest) + "\n"
+            job = latest
+
+    return StreamingResponse(event_stream(job), media_type="application/x-ndjson")
@@ -0,0 +1,12 @@
+# backend/routers/metrics.py
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from backend.src.metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text format. Unauthenticated like /health: expose it to the scraper, not the internet."""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,21 +1,37 @@
 # backend/routers/sessions.py
-from typing import List
-from fastapi import APIRouter, Depends
-from langchain_core.messages import HumanMessage
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
 from backend.database import (
     create_session_db, get_user_sessions, delete_session_db,
-    update_session_title_db, get_session_files_db
+    update_session_title_db, get_session_files_db,
+    get_session_messages_db, iter_session_messages_db
 )
 from backend.security import get_current_user
 from backend.schemas import SessionCreate, SessionResponse, RenameRequest, TitleGenRequest
-from backend.src.agent import get_session_history
+from backend.src.vector_store import delete_from_vector_store
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
+MAX_PAGE_SIZE = 500
+
 @router.get("", response_model=List[SessionResponse])
-async def list_sessions(user: str = Depends(get_current_user)):
-    return get_user_sessions(user)
+async def list_sessions(
+    response: Response,
+    before: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    user: str = Depends(get_current_user),
+):
+    """Newest first. With `limit`, pass the X-Next-Cursor header back as `before` for the next page."""
+    if limit is None:
+        return get_user_sessions(user, before=before)
+    sessions = get_user_sessions(user, before=before, limit=limit + 1)
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        response.headers["X-Next-Cursor"] = sessions[-1]["session_id"]
+    return sessions
 
 @router.post("", response_model=SessionResponse)
 async def create_session(session: SessionCreate, user: str = Depends(get_current_user)):
@@ -67,14 +83,35 @@ async def auto_generate_title(session_id: str, req: TitleGenRequest, user: str =
 
 @router.delete("/{session_id}")
 async def delete_session(session_id: str, user: str = Depends(get_current_user)):
-    delete_session_db(session_id, user)
+    orphaned = delete_session_db(session_id, user)
+    if orphaned is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    for source_id in orphaned:
+        delete_from_vector_store(source_id)
     return {"status": "deleted"}
 
 @router.get("/{session_id}/history")
-async def get_history(session_id: str, user: str = Depends(get_current_user)):
-    history_obj = get_session_history(session_id)
-    messages = []
-    for msg in history_obj.messages:
-        role = "user" if isinstance(msg, HumanMessage) else "assistant"
-        messages.append({"role": role, "content": msg.content})
-    return {"messages": messages}
\ No newline at end of file
+async def get_history(
+    session_id: str,
+    before: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: Literal["json", "ndjson"] = "json",
+    user: str = Depends(get_current_user),
+):
+    """
+    Chat history in chronological order. With `limit`, returns the newest page
+    older than message id `before` plus a `next_cursor` for the page before it.
+    `format=ndjson` streams the full history one message per line.
+    """
+    if format == "ndjson":
+        lines = (json.dumps(message) + "\n" for message in iter_session_messages_db(session_id))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    if limit is None:
+        return {"messages": get_session_messages_db(session_id, before=before), "next_cursor": None}
+    messages = get_session_messages_db(session_id, before=before, limit=limit + 1)
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[1:]
+        next_cursor = messages[0]["id"]
+    return {"messages": messages, "next_cursor": next_cursor}
@@ -1,10 +1,16 @@
 # backend/security.py
+import asyncio
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from backend.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from backend.config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_USERS,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+)
 
 # We typically don't import get_user_from_db here to avoid circular imports 
 # if database.py imports security.py. 
@@ -48,6 +54,36 @@ def get_password_hash(password):
     validate_password_strength(password)
     return pwd_context.hash(password)
 
+# --- OFF-LOOP PASSWORD HASHING ---
+# A bcrypt hash or verify holds a core for hundreds of milliseconds. In an async
+# handler that would stall every chat stream, so they run on a dedicated pool.
+# bcrypt releases the GIL while it works. Work admitted to the pool is capped at
+# workers + queue; a login burst beyond that gets an immediate 503 instead of
+# waiting in line for seconds.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE)
+
+async def _run_password_task(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins at once, please retry.",
+            headers={"Retry-After": "1"},
+        )
+    future = _password_executor.submit(fn, *args)
+    # Released when the work is done or cancelled, not when a disconnected client stops waiting
+    future.add_done_callback(lambda _: _password_slots.release())
+    return await asyncio.wrap_future(future)
+
+async def hash_password_async(password: str):
+    """get_password_hash on the bcrypt pool; the strength check still fails fast with 400."""
+    validate_password_strength(password)
+    return await _run_password_task(pwd_context.hash, password)
+
+async def verify_password_async(plain_password, hashed_password, username=None):
+    """verify_password on the bcrypt pool."""
+    return await _run_password_task(verify_password, plain_password, hashed_password, username)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.datetime.utcnow() + datetime.timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -63,3 +99,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     return username
+
+async def get_admin_user(user: str = Depends(get_current_user)):
+    if user not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -1,15 +1,28 @@
 # backend/src/agent.py
-from langchain.agents import create_tool_calling_agent, AgentExecutor
+import threading
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories import SQLChatMessageHistory
-from backend.config import SQLITE_DB
-from backend.src.core import llm
+from sqlalchemy import create_engine, event
+from backend.config import SQLITE_DB, SQLITE_BUSY_TIMEOUT_MS, HISTORY_TOKEN_BUDGET, HISTORY_SUMMARY_MAX_WORDS
+from backend.src.core import get_llm
 from backend.src.tools import tools
 from backend.src.system_prompt import SYSTEM_PROMPT
+from backend.src.history_window import HistoryWindow
+
+# One pooled engine for chat history instead of a new engine per request
+history_engine = create_engine(
+    f"sqlite:///{SQLITE_DB}",
+    connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000, "check_same_thread": False},
+)
+
+@event.listens_for(history_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA journal_mode=WAL")
+    dbapi_connection.execute("PRAGMA synchronous=NORMAL")
 
 def get_session_history(session_id: str):
-    return SQLChatMessageHistory(session_id=session_id, connection=f"sqlite:///{SQLITE_DB}")
+    return SQLChatMessageHistory(session_id=session_id, connection=history_engine)
 
 prompt = ChatPromptTemplate.from_messages([
     ("system", SYSTEM_PROMPT),
@@ -18,23 +31,59 @@ prompt = ChatPromptTemplate.from_messages([
     ("placeholder", "{agent_scratchpad}"),
 ])
 
-agent = create_tool_calling_agent(
-    llm=llm,
-    tools=tools,
-    prompt=prompt
-)
+# Built on first use / warm-up rather than at import
+_agent_executor = None
+_agent_with_history = None
+_history_window = None
+_build_lock = threading.Lock()
 
-agent_executor = AgentExecutor(
-    agent=agent, 
-    tools=tools, 
-    verbose=True, 
-    handle_parsing_errors=True,
-    max_iterations=5
-)
+def _build_agent():
+    global _agent_executor, _agent_with_history
+    from langchain.agents import create_tool_calling_agent, AgentExecutor
+    agent = create_tool_calling_agent(
+        llm=get_llm(),
+        tools=tools,
+        prompt=prompt
+    )
+
+    agent_executor = AgentExecutor(
+        agent=agent, 
+        tools=tools, 
+        verbose=True, 
+        handle_parsing_errors=True,
+        max_iterations=5
+    )
+
+    agent_with_history = RunnableWithMessageHistory(
+        agent_executor,
+        get_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+    )
+    # Published together and history wrapper first: unlocked readers check _agent_executor
+    _agent_with_history = agent_with_history
+    _agent_executor = agent_executor
+
+def get_agent_executor():
+    if _agent_executor is None:
+        with _build_lock:
+            if _agent_executor is None:
+                _build_agent()
+    return _agent_executor
+
+def get_agent_with_history():
+    get_agent_executor()
+    return _agent_with_history
 
-agent_with_history = RunnableWithMessageHistory(
-    agent_executor,
-    get_session_history,
-    input_messages_key="input",
-    history_messages_key="chat_history",
-)
\ No newline at end of file
+def get_history_window():
+    """Bounds the chat_history sent per turn; older turns live on as a rolling summary."""
+    global _history_window
+    if _history_window is None:
+        with _build_lock:
+            if _history_window is None:
+                _history_window = HistoryWindow(
+                    get_llm().with_config(tags=["internal_summary"]),
+                    token_budget=HISTORY_TOKEN_BUDGET,
+                    summary_max_words=HISTORY_SUMMARY_MAX_WORDS,
+                )
+    return _history_window
@@ -0,0 +1,223 @@
+# backend/src/audit.py
+# Audit trail storage. log_audit (backend/config.py) only puts a record on
+# AUDIT_QUEUE; one writer thread drains it in batches of up to AUDIT_BATCH_SIZE,
+# one transaction per batch, into a SQLite file per calendar month (UTC) under
+# AUDIT_DIR. The monthly files are the rotation: once a month ended more than
+# AUDIT_RETENTION_DAYS ago its file is deleted whole, with no DELETE or VACUUM.
+import os
+import re
+import time
+import queue
+import sqlite3
+import logging
+import calendar
+import threading
+from datetime import datetime, timezone
+
+from backend.config import (
+    AUDIT_QUEUE, AUDIT_DIR, AUDIT_RETENTION_DAYS, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_MS
+)
+
+RETENTION_CHECK_SECONDS = 3600
+FILE_PATTERN = re.compile(r"^audit-(\d{4}-\d{2})\.db$")
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS audit_log
+       (id INTEGER PRIMARY KEY, ts REAL NOT NULL, username TEXT, action TEXT, details TEXT)''',
+    "CREATE INDEX IF NOT EXISTS idx_audit_username ON audit_log(username)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_action ON audit_log(action)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_log(ts)",
+]
+
+_STOP = object()
+
+def month_of(ts: float):
+    return time.strftime("%Y-%m", time.gmtime(ts))
+
+def _month_end(month: str):
+    year, number = map(int, month.split("-"))
+    year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return calendar.timegm((year, number, 1, 0, 0, 0))
+
+def _path(directory: str, month: str):
+    return os.path.join(directory, f"audit-{month}.db")
+
+def audit_months(directory: str):
+    """Months that have an audit file, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    matches = (FILE_PATTERN.match(name) for name in os.listdir(directory))
+    return sorted((m.group(1) for m in matches if m), reverse=True)
+
+class AuditWriter:
+    def __init__(self, records: queue.Queue, directory: str, batch_size: int = 500,
+                 flush_interval_ms: int = 1000, retention_days: int = 365):
+        self.records = records
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.retention_days = retention_days
+        self._connections = {}  # month -> connection, only touched by the writer thread
+        self._thread = None
+        self._stats = {"written": 0, "batches": 0, "failed": 0, "files_deleted": 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write everything queued so far, then stop (FastAPI shutdown)."""
+        if self._thread is None:
+            return
+        self.records.put(_STOP)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def flush(self):
+        """Block until every record queued so far is written."""
+        self.records.join()
+
+    def stats(self):
+        return {**self._stats, "queued": self.records.qsize()}
+
+    # --- WRITER THREAD ---
+
+    def _run(self):
+        self.apply_retention()
+        next_retention = time.monotonic() + RETENTION_CHECK_SECONDS
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                batch.append(self.records.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.records.get_nowait())
+            except queue.Empty:
+                pass
+
+            stopping = any(record is _STOP for record in batch)
+            rows = [record for record in batch if record is not _STOP]
+            if rows:
+                try:
+                    self._write(rows)
+                except sqlite3.Error as e:
+                    self._stats["failed"] += len(rows)
+                    logging.error(f"Audit write of {len(rows)} records failed: {e}")
+            for _ in batch:
+                self.records.task_done()
+
+            if time.monotonic() >= next_retention:
+                self.apply_retention()
+                next_retention = time.monotonic() + RETENTION_CHECK_SECONDS
+
+        for conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+    def _connection(self, month: str):
+        conn = self._connections.get(month)
+        if conn is None:
+            conn = sqlite3.connect(_path(self.directory, month), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            # Late records for last month still land in its file; anything older is closed
+            for stale in sorted(self._connections)[:-1]:
+                self._connections.pop(stale).close()
+            self._connections[month] = conn
+        return conn
+
+    def _write(self, rows):
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(month_of(row[0]), []).append(row)
+        for month, month_rows in by_month.items():
+            conn = self._connection(month)
+            with conn:
+                conn.executemany("INSERT INTO audit_log (ts, username, action, details) VALUES (?, ?, ?, ?)", month_rows)
+            self._stats["written"] += len(month_rows)
+        self._stats["batches"] += 1
+
+    def apply_retention(self, now: float = None):
+        """Delete the files of months that ended more than retention_days ago."""
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        for month in audit_months(self.directory):
+            if _month_end(month) > cutoff:
+                continue
+            conn = self._connections.pop(month, None)
+            if conn is not None:
+                conn.close()
+            for suffix in ("", "-wal", "-shm"):
+                path = _path(self.directory, month) + suffix
+                if os.path.exists(path):
+                    os.remove(path)
+            self._stats["files_deleted"] += 1
+            logging.info(f"Audit records of {month} deleted (retention {self.retention_days} days)")
+
+def query_audit(directory: str, username: str = None, action: str = None, since: float = None,
+                until: float = None, before: str = None, limit: int = 100):
+    """
+    Newest first. `before` is the id ("YYYY-MM:n") of the last record already seen; only
+    older records are returned (keyset pagination across the monthly files).
+    Returns (records, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    cursor_month, cursor_id = None, None
+    if before:
+        match = re.fullmatch(r"(\d{4}-\d{2}):(\d+)", before)
+        if not match:
+            raise ValueError(f"Invalid cursor: {before}")
+        cursor_month, cursor_id = match.group(1), int(match.group(2))
+
+    records = []
+    for month in audit_months(directory):
+        if (cursor_month and month > cursor_month) or (until is not None and month > month_of(until)):
+            continue
+        if since is not None and month < month_of(since):
+            break
+
+        query = "SELECT id, ts, username, action, details FROM audit_log WHERE 1 = 1"
+        params = []
+        for clause, value in (("username = ?", username), ("action = ?", action),
+                              ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        if month == cursor_month:
+            query += " AND id < ?"
+            params.append(cursor_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1 - len(records))
+
+        conn = sqlite3.connect(f"file:{_path(directory, month)}?mode=ro", uri=True)
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        records.extend(
+            {
+                "id": f"{month}:{row[0]}",
+                "time": datetime.fromtimestamp(row[1], timezone.utc).isoformat(),
+                "username": row[2],
+                "action": row[3],
+                "details": row[4],
+            }
+            for row in rows
+        )
+        if len(records) > limit:
+            break
+
+    if len(records) > limit:
+        return records[:limit], records[limit - 1]["id"]
+    return records, None
+
+audit_writer = AuditWriter(
+    AUDIT_QUEUE, AUDIT_DIR,
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval_ms=AUDIT_FLUSH_INTERVAL_MS,
+    retention_days=AUDIT_RETENTION_DAYS,
+)
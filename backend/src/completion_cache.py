@@ -0,0 +1,128 @@
+# backend/src/completion_cache.py
+# LangChain cache for the internal (temperature=0) tool completions.
+# Entries are keyed by SHA-256 of the LLM string (model + parameters) and the
+# serialized prompt. A byte-capped in-memory LRU sits in front of a byte-capped
+# SQLite tier; both evict least recently used entries.
+#
+# Modes:
+#   record  - serve hits, call the model on a miss and store the result
+#   replay  - serve hits only; a miss raises instead of touching the network
+import time
+import sqlite3
+import warnings
+import hashlib
+import threading
+from collections import OrderedDict
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+# loads() is marked beta and would otherwise warn on every cache hit
+warnings.filterwarnings("ignore", message="The function `loads` is in beta")
+
+class CompletionReplayMiss(LookupError):
+    """Raised in replay mode when a prompt was never recorded."""
+
+class CompletionCache(BaseCache):
+    def __init__(self, db_path: str, memory_max_bytes: int = 32 * 2**20,
+                 disk_max_bytes: int = 512 * 2**20, mode: str = "record"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown completion cache mode: {mode}")
+        self.mode = mode
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory = OrderedDict()  # key -> serialized generations
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions "
+            "(key TEXT PRIMARY KEY, value TEXT, size INTEGER, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions(last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str):
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: str):
+        # Caller holds self._lock
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def lookup(self, prompt: str, llm_string: str):
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return loads(value)
+
+            row = self._conn.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                self._remember(key, row[0])
+                self.counters["disk_hits"] += 1
+                return loads(row[0])
+
+            self.counters["misses"] += 1
+        if self.mode == "replay":
+            raise CompletionReplayMiss("No recorded completion for this prompt (LLM_CACHE_MODE=replay)")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        key = self._key(prompt, llm_string)
+        value = dumps(return_val)
+        size = len(value)
+        with self._lock:
+            self._remember(key, value)
+            old = self._conn.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)", (key, value, size, time.time())
+            )
+            self._disk_bytes += size - (old[0] if old else 0)
+            while self._disk_bytes > self.disk_max_bytes:
+                row = self._conn.execute(
+                    "SELECT key, size FROM completions ORDER BY last_used LIMIT 1"
+                ).fetchone()
+                if not row:
+                    break
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (row[0],))
+                self._disk_bytes -= row[1]
+                self.counters["evictions"] += 1
+            self._conn.commit()
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+            self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+            return {
+                **self.counters,
+                "mode": self.mode,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": entries,
+                "disk_bytes": self._disk_bytes,
+            }
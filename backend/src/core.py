@@ -1,15 +1,112 @@
 # backend/src/core.py
-from langchain_openai import ChatOpenAI
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from backend.config import OPENROUTER_API_KEY
-
-# Initialize Embeddings
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-
-# Initialize LLM
-llm = ChatOpenAI(
-    model="deepseek/deepseek-chat",
-    openai_api_key=OPENROUTER_API_KEY,
-    openai_api_base="https://openrouter.ai/api/v1",
-    temperature=0
-)
\ No newline at end of file
+# Models are built on first use (or by the warm-up in the FastAPI lifespan),
+# never at import, so importing the app, the tests or a CLI stays cheap.
+import threading
+from backend.config import (
+    OPENROUTER_API_KEY, LLM_BASE_URL, LLM_MODEL, EMBEDDING_MODEL, EMBEDDING_BACKEND, ONNX_EMBEDDING_PATH, EMBEDDING_CACHE_DB,
+    EMBEDDING_CACHE_MEMORY_ENTRIES, EMBEDDING_CACHE_DISK_ENTRIES,
+    EMBEDDING_BATCHING, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_WAIT_MS, EMBEDDING_TORCH_THREADS,
+    LLM_CACHE_MODE, LLM_CACHE_DB, LLM_CACHE_MEMORY_MB, LLM_CACHE_DISK_MB,
+    VISION_MAX_DIMENSION, VISION_JPEG_QUALITY, VISION_CONCURRENCY, TRANSCRIPTION_CACHE_DB
+)
+from backend.src.embedding_cache import CachedEmbeddings
+from backend.src.embedding_service import BatchingEmbeddings
+from backend.src.completion_cache import CompletionCache
+from backend.src.vision import VisionService, TranscriptionCache
+
+_instances = {}
+_locks = {name: threading.Lock() for name in ("embeddings", "llm", "cached_llm", "completion_cache", "vision")}
+
+def _get_or_build(name: str, build):
+    instance = _instances.get(name)
+    if instance is None:
+        with _locks[name]:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = build()
+    return instance
+
+def is_loaded(name: str):
+    return name in _instances
+
+def _build_embeddings():
+    if EMBEDDING_BACKEND == "onnx":
+        from backend.src.onnx_embeddings import OnnxEmbeddings
+        model = OnnxEmbeddings(ONNX_EMBEDDING_PATH, threads=EMBEDDING_TORCH_THREADS)
+        # int8 vectors differ slightly from fp32 ones, so they are cached separately
+        cache_name = f"{EMBEDDING_MODEL}-onnx-int8"
+    else:
+        # Imported here: sentence-transformers/torch are the bulk of the cold start
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        cache_name = EMBEDDING_MODEL
+    if EMBEDDING_BATCHING:
+        # Cache misses from every thread are micro-batched by one worker that owns the model
+        model = BatchingEmbeddings(
+            model,
+            max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+            max_wait_ms=EMBEDDING_MAX_WAIT_MS,
+            torch_threads=EMBEDDING_TORCH_THREADS if EMBEDDING_BACKEND == "torch" else 0,
+        )
+    # Cached: repeated chunks, queries and clauses skip the model
+    return CachedEmbeddings(
+        model,
+        model_name=cache_name,
+        db_path=EMBEDDING_CACHE_DB,
+        memory_max_entries=EMBEDDING_CACHE_MEMORY_ENTRIES,
+        disk_max_entries=EMBEDDING_CACHE_DISK_ENTRIES,
+    )
+
+def get_embeddings():
+    return _get_or_build("embeddings", _build_embeddings)
+
+def get_embedding_service():
+    """The micro-batching worker, or None if batching is off or the model isn't loaded yet."""
+    embeddings = _instances.get("embeddings")
+    if embeddings is not None and isinstance(embeddings.underlying, BatchingEmbeddings):
+        return embeddings.underlying
+    return None
+
+def _chat_model(**kwargs):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        openai_api_key=OPENROUTER_API_KEY,
+        openai_api_base=LLM_BASE_URL,
+        temperature=0,
+        **kwargs
+    )
+
+def get_llm():
+    return _get_or_build("llm", _chat_model)
+
+def get_completion_cache():
+    """None when LLM_CACHE_MODE=off."""
+    if LLM_CACHE_MODE == "off":
+        return None
+    return _get_or_build("completion_cache", lambda: CompletionCache(
+        LLM_CACHE_DB,
+        memory_max_bytes=LLM_CACHE_MEMORY_MB * 2**20,
+        disk_max_bytes=LLM_CACHE_DISK_MB * 2**20,
+        mode=LLM_CACHE_MODE,
+    ))
+
+def get_cached_llm():
+    """
+    Same model with the completion cache, for the deterministic internal tool calls only.
+    The agent itself stays uncached: a cache hit would skip token streaming.
+    """
+    cache = get_completion_cache()
+    if cache is None:
+        return get_llm()
+    return _get_or_build("cached_llm", lambda: _chat_model(cache=cache))
+
+def get_vision_service():
+    """Image transcription; builds its own chat model, so it never shares an async client with the agent."""
+    return _get_or_build("vision", lambda: VisionService(
+        _chat_model,
+        TranscriptionCache(TRANSCRIPTION_CACHE_DB, model_name=LLM_MODEL),
+        concurrency=VISION_CONCURRENCY,
+        max_dimension=VISION_MAX_DIMENSION,
+        quality=VISION_JPEG_QUALITY,
+    ))
@@ -1,89 +1,173 @@
 # backend/src/document_processor.py
 import os
-import base64
+import time
 import logging
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_unstructured import UnstructuredLoader
-from langchain_core.messages import HumanMessage
 from langchain_community.vectorstores.utils import filter_complex_metadata
 
-from backend.src.core import llm
-from backend.src.vector_store import get_vector_store
-
-def refine_chunks(docs):
-    """Further split clauses (a), (b), (c), (d) into smaller retrievable chunks."""
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=800,
-        chunk_overlap=100,
-        separators=["\n(a)", "\n(b)", "\n(c)", "\n(d)", "\n\n"]
-    )
-    refined = []
-    for doc in docs:
-        refined.extend(
-            splitter.create_documents([doc.page_content], metadatas=[doc.metadata])
-        )
-    return refined
-
-def process_document(file_path: str, file_id: str):
+from backend.config import INGEST_BATCH_SIZE, PDF_PARALLEL_MIN_PAGES, PDF_PAGES_PER_RANGE
+from backend.src.core import get_embeddings, get_vision_service
+from backend.src.parsing import (
+    IMAGE_EXTENSIONS, DOCUMENT_EXTENSIONS, iter_refined, partition_document,
+    count_pdf_pages, partition_pdf_parallel
+)
+from backend.src.vector_store import get_vector_store, get_lexical_index
+from backend.src.metrics import STAGE_SECONDS, timed
+
+def _noop_progress(stage: str, count: int):
+    pass
+
+def transcribe_image(file_path: str, pages=None):
+    """
+    Transcribe an image (every page of a TIFF) with LLM Vision and split the text into
+    chunks tagged with their page number. `pages` are page texts already transcribed
+    as part of a batch (see transcribe_images).
+    """
+    logging.info("🖼️ Processing Image with LLM Vision...")
+    started = time.perf_counter()
+    if pages is None:
+        pages = get_vision_service().transcribe(file_path)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    splits = []
+    for page_number, text in enumerate(pages, start=1):
+        if text.strip():
+            splits.extend(splitter.create_documents([text.strip()], metadatas=[{"page_number": page_number}]))
+    STAGE_SECONDS.labels("parse").observe(time.perf_counter() - started)
+    return splits
+
+def transcribe_images(file_paths):
+    """
+    Transcribe several images concurrently (VISION_CONCURRENCY calls at a time).
+    Returns {path: [page text, ...]}; images that failed are missing.
+    """
+    if not file_paths:
+        return {}
+    started = time.perf_counter()
+    transcripts = get_vision_service().transcribe_batch(file_paths)
+    STAGE_SECONDS.labels("transcribe_batch").observe(time.perf_counter() - started)
+    return transcripts
+
+# --- STREAMING PIPELINE ---
+# parse -> refine -> clean -> embed -> upsert, as generators pulled one batch of
+# INGEST_BATCH_SIZE at a time: a stage only produces when the upsert asks for
+# more, so at most one batch of vectors is alive however large the document is,
+# and every batch is searchable as soon as it is stored. Unstructured returns a
+# file's elements all at once, though, so the parsed chunks themselves still
+# scale with the document; only refinement onwards is batch-bounded.
+
+def chunk_id(file_id: str, index: int):
+    """
+    Deterministic, so replaying a batch after a crash overwrites it in Chroma (upsert)
+    and the BM25 index (postings replaced per chunk) instead of duplicating it.
+    """
+    return f"{file_id}-{index:06d}"
+
+def iter_clean(splits, file_id: str):
+    """Tag each chunk for deletion, drop complex metadata and skip empty chunks."""
+    for doc in splits:
+        doc.metadata["source_id"] = file_id  # <--- Tag for deletion
+        cleaned = filter_complex_metadata([doc])[0]
+        if cleaned.page_content.strip():
+            yield cleaned
+
+def iter_batches(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def store_chunks(splits, file_id: str, progress=_noop_progress, resume_from: int = 0):
+    """
+    Clean, embed and upsert chunks from any iterable in batches of INGEST_BATCH_SIZE.
+    The first `resume_from` chunks are taken as already stored (a resumed job) and only
+    counted. Reports 'parsed', 'embedded' and 'stored' counts per batch through `progress`.
+    """
+    vectorstore = None
+    stored = 0
+    for batch in iter_batches(iter_clean(splits, file_id), INGEST_BATCH_SIZE):
+        first_index = stored
+        stored += len(batch)
+        if stored <= resume_from:
+            continue
+        if first_index < resume_from:
+            # The checkpoint fell inside this batch; redo the part that wasn't recorded
+            batch = batch[resume_from - first_index:]
+            first_index = resume_from
+        if vectorstore is None:
+            vectorstore, embeddings = get_vector_store(), get_embeddings()
+        progress("parsed", len(batch))
+
+        texts = [doc.page_content for doc in batch]
+        started = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        STAGE_SECONDS.labels("embed").observe(time.perf_counter() - started)
+        progress("embedded", len(batch))
+
+        ids = [chunk_id(file_id, first_index + i) for i in range(len(batch))]
+        metadatas = [doc.metadata for doc in batch]
+        started = time.perf_counter()
+        vectorstore._collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+        get_lexical_index().add_chunks(file_id, ids, texts, metadatas)
+        STAGE_SECONDS.labels("upsert").observe(time.perf_counter() - started)
+        progress("stored", len(batch))
+
+    logging.info(f"✅ Added {stored - min(resume_from, stored)} chunks for file {file_id}")
+    return stored
+
+def iter_splits(file_path: str, file_ext: str, parse_executor=None, content_type: str = None):
+    """
+    Parse stage: title-based chunks of a PDF/Word file, clause-refined lazily. Runs on
+    the first pull; the "parse" histogram gets the partitioning plus all refinement.
+    """
+    started = time.perf_counter()
+    page_count = 0
+    if file_ext == ".pdf" and parse_executor is not None:
+        page_count = count_pdf_pages(file_path)
+    if page_count and page_count >= PDF_PARALLEL_MIN_PAGES:
+        logging.info(f"📄 Partitioning {page_count} pages in ranges of {PDF_PAGES_PER_RANGE}...")
+        chunks = partition_pdf_parallel(file_path, parse_executor, PDF_PAGES_PER_RANGE, page_count)
+    elif parse_executor is not None:
+        chunks = parse_executor.submit(partition_document, file_path, content_type).result()
+    else:
+        chunks = partition_document(file_path, content_type)
+    partitioned = time.perf_counter() - started
+    yield from timed(iter_refined(chunks), lambda refining: STAGE_SECONDS.labels("parse").observe(partitioned + refining))
+
+def process_document(file_path: str, file_id: str, progress=_noop_progress, parse_executor=None,
+                     resume_from: int = 0, content_type: str = None, transcript=None):
+    """
+    Parse, embed and store a single file. When `parse_executor` is given, the
+    Unstructured partitioning of PDFs/Word files runs there instead of in the caller,
+    and PDFs of PDF_PARALLEL_MIN_PAGES or more are partitioned page range by page range.
+    `resume_from` skips chunks a previous, interrupted run already stored, and
+    `content_type` (sniffed at upload) spares the parser its own file-type detection.
+    For images, `transcript` holds page texts from a batched transcribe_images call.
+    """
     try:
         splits = []
         file_ext = os.path.splitext(file_path)[1].lower()
-        
+
         # --- CASE 1: IMAGES (LLM Vision) ---
-        if file_ext in ['.png', '.jpg', '.jpeg']:
-            logging.info("🖼️ Processing Image with LLM Vision...")
-            with open(file_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode("utf-8")
-            
-            message = HumanMessage(
-                content=[
-                    {"type": "text", "text": "Transcribe this legal document. Capture all headers and clauses accurately."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
-                ]
-            )
-            response = llm.invoke([message])
-            if isinstance(response.content, str) and response.content.strip():
-                splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-                splits = splitter.create_documents([response.content.strip()])
-            else:
-                return 0
+        if file_ext in IMAGE_EXTENSIONS:
+            splits = transcribe_image(file_path, transcript)
 
         # --- CASE 2: PDFs & WORD DOCS ---
-        elif file_ext in ['.pdf', '.docx', '.doc']:
+        elif file_ext in DOCUMENT_EXTENSIONS:
             logging.info(f"📄 Processing {file_ext} with Structural Chunking...")
-            # UnstructuredLoader handles .docx natively
-            loader = UnstructuredLoader(
-                file_path,
-                chunking_strategy="by_title",
-                max_characters=2000,
-                new_after_n_chars=1500,
-                combine_text_under_n_chars=500,
-            )
-            splits = loader.load()
-            
-            if splits:
-                splits = refine_chunks(splits)
+            splits = iter_splits(file_path, file_ext, parse_executor, content_type)
 
         # --- COMMON: CLEAN & STORE ---
-        if splits:
-            for doc in splits:
-                doc.metadata["source_id"] = file_id  # <--- Tag for deletion
-            
-            cleaned_splits = filter_complex_metadata(splits)
-            valid_splits = [doc for doc in cleaned_splits if doc.page_content.strip()]
-            
-            if valid_splits:
-                vectorstore = get_vector_store()
-                vectorstore.add_documents(valid_splits)
-                logging.info(f"✅ Added {len(valid_splits)} chunks for file {file_id}")
-                return len(valid_splits)
-        
-        return 0
+        return store_chunks(splits, file_id, progress, resume_from=resume_from)
 
     except Exception as e:
         logging.error(f"❌ Error processing document: {str(e)}")
         raise e
-    
+
     finally:
         if os.getenv("DEBUG_MODE", "false").lower() != "true":
             if os.path.exists(file_path):
@@ -0,0 +1,173 @@
+# backend/src/embedding_cache.py
+# Caching wrapper around an Embeddings model.
+# Vectors are keyed by model name + SHA-256 of the text. Queries go through an
+# in-memory LRU, chunk embeddings through an on-disk SQLite tier (float32
+# blobs); both tiers are size-capped and evict least recently used entries.
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, model_name: str, db_path: str,
+                 memory_max_entries: int = 4096, disk_max_entries: int = 500_000,
+                 symmetric: bool = True):
+        self.underlying = underlying
+        self.model_name = model_name
+        # Symmetric models (plain sentence-transformers) embed queries exactly like
+        # documents, so several query misses can share one embed_documents batch
+        self.symmetric = symmetric
+        self.memory_max_entries = memory_max_entries
+        self.disk_max_entries = disk_max_entries
+
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+
+        self._disk_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_used REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        # dedup_hits: repeats of a text within one embed_documents batch, embedded once
+        self.counters = {
+            "memory_hits": 0, "memory_misses": 0, "disk_hits": 0, "disk_misses": 0, "dedup_hits": 0, "evictions": 0
+        }
+
+    def _key(self, kind: str, text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    # --- QUERIES: in-memory LRU ---
+
+    def embed_query(self, text: str):
+        key = self._key("query", text)
+        with self._memory_lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return list(self._memory[key])
+            self.counters["memory_misses"] += 1
+
+        vector = self.underlying.embed_query(text)
+
+        with self._memory_lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_max_entries:
+                self._memory.popitem(last=False)
+                self.counters["evictions"] += 1
+        return list(vector)
+
+    def embed_queries(self, texts):
+        """Batch form of embed_query: cached queries are reused, the rest run as one batch."""
+        keys = [self._key("query", t) for t in texts]
+        found = {}
+        with self._memory_lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.counters["memory_hits"] += sum(1 for key in keys if key in found)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            if self.symmetric:
+                computed = self.underlying.embed_documents(list(missing.values()))
+            else:
+                computed = [self.underlying.embed_query(t) for t in missing.values()]
+            with self._memory_lock:
+                self.counters["memory_misses"] += len(missing)
+                for key, vector in zip(missing.keys(), computed):
+                    self._memory[key] = vector
+                    found[key] = vector
+                while len(self._memory) > self.memory_max_entries:
+                    self._memory.popitem(last=False)
+                    self.counters["evictions"] += 1
+        return [list(found[key]) for key in keys]
+
+    # --- CHUNKS: on-disk tier ---
+
+    def embed_documents(self, texts):
+        keys = [self._key("doc", t) for t in texts]
+        found = self._disk_get(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        unique = len(set(keys))
+        with self._memory_lock:
+            self.counters["disk_hits"] += unique - len(missing)
+            self.counters["disk_misses"] += len(missing)
+            self.counters["dedup_hits"] += len(keys) - unique
+
+        if missing:
+            # One batched forward pass for everything not yet cached
+            computed = self.underlying.embed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), computed))
+            self._disk_put(new_entries)
+            found.update(new_entries)
+
+        return [list(found[key]) for key in keys]
+
+    def _disk_get(self, keys):
+        found = {}
+        now = time.time()
+        with self._disk_lock:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [now, *batch]
+                    )
+            self._conn.commit()
+        return found
+
+    def _disk_put(self, entries):
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in entries.items()]
+        with self._disk_lock:
+            # Only rows that were actually new grow the table; known keys (a concurrent
+            # caller embedded them first) just get their vector and last_used refreshed
+            inserted = self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)", rows).rowcount
+            if inserted < len(rows):
+                self._conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_used = ? WHERE key = ?",
+                    [(blob, used, key) for key, blob, used in rows],
+                )
+            self._disk_count += inserted
+            if self._disk_count > self.disk_max_entries:
+                self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                overflow = self._disk_count - self.disk_max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (overflow,)
+                    )
+                    self._disk_count -= overflow
+                    with self._memory_lock:
+                        self.counters["evictions"] += overflow
+            self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters plus current tier sizes."""
+        with self._memory_lock:
+            return {**self.counters, "memory_entries": len(self._memory), "disk_entries": self._disk_count}
@@ -0,0 +1,132 @@
+# backend/src/embedding_service.py
+# A single worker thread owns the embedding model. Callers on any thread
+# enqueue their texts and block on a Future; the worker collects whatever
+# arrives within max_wait_ms (up to max_batch_size texts) and runs it as one
+# forward pass, so concurrent queries and upload batches share the model
+# instead of thrashing the CPU with many tiny batches.
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+# Upper bounds of the histogram buckets (texts per batch / requests waiting)
+HISTOGRAM_BOUNDS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+def _bucket(value: int):
+    for bound in HISTOGRAM_BOUNDS:
+        if value <= bound:
+            return str(bound)
+    return "+Inf"
+
+def _empty_histogram():
+    return {**{str(b): 0 for b in HISTOGRAM_BOUNDS}, "+Inf": 0}
+
+class BatchingEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, torch_threads: int = 0):
+        # Queries are embedded as documents: only valid for symmetric models
+        # such as plain sentence-transformers (what CachedEmbeddings assumes too)
+        self.underlying = underlying
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.torch_threads = torch_threads
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0, "batches": 0, "texts": 0,
+            "batch_size_histogram": _empty_histogram(),
+            "queue_depth_histogram": _empty_histogram(),
+        }
+        self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+        self._worker.start()
+
+    # --- CALLER SIDE ---
+
+    def _submit(self, texts):
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._submit(texts)
+
+    def embed_query(self, text: str):
+        return self._submit([text])[0]
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=5)
+
+    # --- WORKER SIDE ---
+
+    def _collect(self, first):
+        """The first request plus whatever else arrives within max_wait, up to max_batch_size texts."""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # handle shutdown after this batch
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    def _run(self):
+        if self.torch_threads:
+            try:
+                import torch
+                torch.set_num_threads(self.torch_threads)
+            except ImportError:
+                pass
+
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size = self._collect(first)
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["texts"] += size
+                self._stats["batch_size_histogram"][_bucket(size)] += 1
+                self._stats["queue_depth_histogram"][_bucket(len(batch) + self._queue.qsize())] += 1
+
+            try:
+                vectors = self.underlying.embed_documents([t for texts, _ in batch for t in texts])
+            except Exception as e:
+                logging.error(f"Embedding batch failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for texts, future in batch:
+                future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                **self._stats,
+                "batch_size_histogram": dict(self._stats["batch_size_histogram"]),
+                "queue_depth_histogram": dict(self._stats["queue_depth_histogram"]),
+            }
+        stats["queue_depth"] = self._queue.qsize()
+        stats["mean_batch_size"] = round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000
+        return stats
@@ -0,0 +1,147 @@
+# backend/src/history_window.py
+# Keeps the chat_history handed to the agent within a token budget. The most
+# recent turns are sent verbatim; older turns are folded into a per-session
+# summary stored in SQLite. The summary is only extended with the turns that
+# newly fell out of the window, never regenerated from the full history.
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.messages import HumanMessage, SystemMessage, get_buffer_string
+
+from backend.database import get_history_summary_db, save_history_summary_db
+
+# Per-message overhead (role and separators) in the OpenAI chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARK = " [...]"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # The BPE file is downloaded on first use; offline hosts fall back to an estimate
+                    logging.warning(f"⚠️ tiktoken encoding unavailable, estimating tokens: {e}")
+                    _encoding = False
+    return _encoding or None
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def count_message_tokens(messages) -> int:
+    return sum(
+        count_text_tokens(m.content if isinstance(m.content, str) else str(m.content)) + MESSAGE_OVERHEAD_TOKENS
+        for m in messages
+    )
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """The first `max_tokens` tokens of `text`, marked as cut when anything was dropped."""
+    if count_text_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_text_tokens(TRUNCATION_MARK))
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:keep * 4] + TRUNCATION_MARK
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:keep]) + TRUNCATION_MARK
+
+def _window_start(messages, start: int, budget: int) -> int:
+    """
+    Index of the oldest human turn from which messages[i:] fits in `budget`. When not
+    even the latest turn fits, that turn's index anyway: it is truncated, never summarized.
+    """
+    used = 0
+    cut = len(messages)
+    for i in range(len(messages) - 1, start - 1, -1):
+        used += count_message_tokens([messages[i]])
+        if used > budget:
+            break
+        if isinstance(messages[i], HumanMessage):
+            cut = i
+    if cut == len(messages):
+        cut = next((i for i in range(len(messages) - 1, start - 1, -1) if isinstance(messages[i], HumanMessage)), start)
+    return cut
+
+def _fit_turn(messages, budget: int):
+    """Cut each message of an oversized turn to an equal share of `budget`."""
+    share = max(1, budget // len(messages) - MESSAGE_OVERHEAD_TOKENS)
+    return [
+        m.copy(update={"content": truncate_text(m.content, share)}) if isinstance(m.content, str) else m
+        for m in messages
+    ]
+
+class HistoryWindow:
+    def __init__(self, llm, token_budget: int, summary_max_words: int = 250):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.summary_max_words = summary_max_words
+        self._lock = threading.Lock()
+        self._stats = {"turns": 0, "summaries": 0, "tokens_full": 0, "tokens_sent": 0}
+
+    async def _extend_summary(self, summary: str, messages) -> str:
+        prompt = (
+            "You maintain a running summary of a conversation between a user and a legal assistant. "
+            f"Update the summary with the new exchanges below, keeping it under {self.summary_max_words} words. "
+            "Preserve document names, clause numbers, jurisdictions, dates and any conclusions reached.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\n"
+            f"New exchanges:\n{get_buffer_string(messages)}"
+        )
+        response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+        return response.content.strip()
+
+    async def prepare(self, session_id: str, messages):
+        """
+        Returns the chat_history to send for this turn: an optional summary
+        message followed by the recent turns that fit in the budget.
+        """
+        summary, summarized = await asyncio.to_thread(get_history_summary_db, session_id)
+        if summarized > len(messages):  # history was cleared underneath the summary
+            summary, summarized = "", 0
+
+        start = summarized
+        if count_message_tokens(messages[summarized:]) > self.token_budget:
+            # Trim to half the budget so the summary is extended every few turns, not every turn
+            start = _window_start(messages, summarized, self.token_budget // 2)
+        if start > summarized:
+            try:
+                summary = await self._extend_summary(summary, messages[summarized:start])
+                await asyncio.to_thread(save_history_summary_db, session_id, summary, start)
+                with self._lock:
+                    self._stats["summaries"] += 1
+            except Exception as e:
+                # Still respect the budget; the dropped turns are summarized on a later turn
+                logging.error(f"History summary failed for session {session_id}: {e}")
+
+        chat_history = list(messages[start:])
+        if count_message_tokens(chat_history) > self.token_budget:
+            chat_history = _fit_turn(chat_history, self.token_budget)
+        if summary:
+            chat_history.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+
+        full_tokens = count_message_tokens(messages)
+        sent_tokens = count_message_tokens(chat_history)
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["tokens_full"] += full_tokens
+            self._stats["tokens_sent"] += sent_tokens
+        if full_tokens > sent_tokens:
+            logging.info(f"🧾 Session {session_id}: sent {sent_tokens} history tokens, saved {full_tokens - sent_tokens}")
+        return chat_history
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["tokens_saved"] = stats["tokens_full"] - stats["tokens_sent"]
+        stats["token_budget"] = self.token_budget
+        return stats
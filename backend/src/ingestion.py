@@ -0,0 +1,223 @@
+# backend/src/ingestion.py
+# Background ingestion jobs for /upload.
+# Files are processed by a bounded thread pool (INGEST_CONCURRENCY) so parsing,
+# vision calls and vector upserts never run on the event loop. The CPU-heavy
+# Unstructured partitioning is pushed one level further into a process pool.
+# Every queued file has a checkpoint row in SQLite that counts the chunks
+# already stored, so a job cut short by a crash resumes on the next start.
+import os
+import copy
+import time
+import logging
+import threading
+import multiprocessing
+from uuid import uuid4
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from backend.config import INGEST_CONCURRENCY, INGEST_PARSE_PROCESSES, log_audit
+from backend.database import (
+    attach_content_db, get_content_db, save_ingest_checkpoints_db, advance_ingest_checkpoint_db,
+    get_ingest_checkpoint_db, clear_ingest_checkpoint_db, get_pending_ingests_db
+)
+from backend.src.document_processor import process_document, transcribe_images
+from backend.src.parsing import IMAGE_EXTENSIONS
+from backend.src.vector_store import delete_from_vector_store
+
+TERMINAL_STATES = ("completed", "failed")
+JOB_RETENTION_SECONDS = 3600  # finished jobs stay queryable for an hour
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+_job_executor = None
+_parse_executor = None
+
+# --- WORKER LIFECYCLE ---
+
+def start_workers():
+    global _job_executor, _parse_executor
+    if _job_executor is None:
+        _job_executor = ThreadPoolExecutor(max_workers=INGEST_CONCURRENCY, thread_name_prefix="ingest")
+    if _parse_executor is None:
+        # 'spawn' avoids forking a process that already holds torch threads
+        _parse_executor = ProcessPoolExecutor(
+            max_workers=INGEST_PARSE_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+def shutdown_workers():
+    global _job_executor, _parse_executor
+    if _job_executor is not None:
+        _job_executor.shutdown(wait=False, cancel_futures=True)
+        _job_executor = None
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+# --- JOB REGISTRY ---
+
+def create_job(user: str, session_id: str, files: list, job_id: str = None):
+    """
+    Register a job for already-saved files: [{'file_id', 'filename', 'path', 'content_hash', 'content_type'}, ...].
+    Pass `job_id` to re-register an interrupted job under its original id.
+    """
+    job_id = job_id or str(uuid4())
+    save_ingest_checkpoints_db(job_id, user, session_id, files)
+    now = datetime.now().isoformat()
+    job = {
+        "job_id": job_id,
+        "user": user,
+        "session_id": session_id,
+        "status": "queued",
+        "created_at": now,
+        "updated_at": now,
+        "version": 0,
+        "finished_at": None,
+        "files": [
+            {
+                "file_id": f["file_id"],
+                "filename": f["filename"],
+                "path": f["path"],
+                "content_hash": f["content_hash"],
+                "content_type": f.get("content_type"),
+                "status": "Queued",
+                "chunks_parsed": 0,
+                "chunks_embedded": 0,
+                "chunks_stored": f.get("chunks_stored", 0),
+            }
+            for f in files
+        ],
+    }
+    with _jobs_lock:
+        _prune_finished()
+        _jobs[job_id] = job
+    return job_id
+
+def _prune_finished():
+    cutoff = time.monotonic() - JOB_RETENTION_SECONDS
+    for job_id in [j for j, job in _jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+        del _jobs[job_id]
+
+def get_job(job_id: str):
+    """Return a snapshot of the job without internal fields, or None."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _public_view(job) if job else None
+
+def _public_view(job):
+    view = copy.deepcopy(job)
+    view.pop("finished_at", None)
+    for f in view["files"]:
+        f.pop("path", None)
+        f.pop("content_hash", None)
+        f.pop("content_type", None)
+    return view
+
+def _update(job_id: str, file_index=None, **fields):
+    with _jobs_lock:
+        job = _jobs[job_id]
+        target = job if file_index is None else job["files"][file_index]
+        for key, value in fields.items():
+            if key.startswith("add_"):
+                key = key[4:]
+                target[key] += value
+            else:
+                target[key] = value
+        job["updated_at"] = datetime.now().isoformat()
+        if job["status"] in TERMINAL_STATES and job["finished_at"] is None:
+            job["finished_at"] = time.monotonic()
+        job["version"] += 1
+
+# --- EXECUTION ---
+
+def submit_job(job_id: str):
+    start_workers()
+    _job_executor.submit(_run_job, job_id)
+
+def _run_job(job_id: str):
+    with _jobs_lock:
+        job = _jobs[job_id]
+        user, session_id = job["user"], job["session_id"]
+        files = [(f["file_id"], f["filename"], f["path"], f["content_hash"], f["content_type"]) for f in job["files"]]
+
+    _update(job_id, status="running")
+    # Images of one upload are transcribed together, with the vision calls overlapping;
+    # ones that fail here are retried on their own below
+    images = [
+        path for _, _, path, content_hash, _ in files
+        if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS and get_content_db(content_hash) is None
+    ]
+    try:
+        transcripts = transcribe_images(images)
+    except Exception as e:
+        logging.error(f"Batch transcription for job {job_id} failed: {e}")
+        transcripts = {}
+
+    failures = 0
+    for index, (file_id, filename, path, content_hash, content_type) in enumerate(files):
+        _update(job_id, index, status="Processing")
+
+        def progress(stage, count, _index=index, _file_id=file_id):
+            if stage == "stored":
+                advance_ingest_checkpoint_db(_file_id, count)
+            _update(job_id, _index, **{f"add_chunks_{stage}": count})
+
+        try:
+            resume_from = get_ingest_checkpoint_db(file_id)
+            # An identical file may have finished ingesting while this one sat in the queue
+            existing = attach_content_db(session_id, filename, file_id, content_hash)
+            if existing:
+                if os.path.exists(path):
+                    os.remove(path)
+                if resume_from:
+                    delete_from_vector_store(file_id)  # partial chunks from an interrupted run
+                _update(job_id, index, status="Success", chunks=existing["chunks"], deduplicated=True)
+                log_audit(user, "UPLOAD", f"Linked {filename} to existing content {content_hash[:12]}")
+                continue
+
+            chunks = process_document(
+                path, file_id, progress=progress, parse_executor=_parse_executor,
+                resume_from=resume_from, content_type=content_type, transcript=transcripts.get(path),
+            )
+            if chunks > 0:
+                record = attach_content_db(session_id, filename, file_id, content_hash, source_id=file_id, chunks=chunks)
+                if record["source_id"] != file_id:
+                    # Lost a race with a concurrent identical upload: keep theirs, drop ours
+                    delete_from_vector_store(file_id)
+            _update(job_id, index, status="Success", chunks=chunks)
+            log_audit(user, "UPLOAD", f"Processed {filename}")
+        except Exception as e:
+            failures += 1
+            logging.error(f"Ingestion job {job_id} failed on {filename}: {e}")
+            # Chunks stream into the index batch by batch; don't leave half a document searchable
+            delete_from_vector_store(file_id)
+            _update(job_id, index, status="Error", detail=str(e))
+            log_audit(user, "UPLOAD_ERROR", f"Failed {filename}: {str(e)}")
+        finally:
+            clear_ingest_checkpoint_db(file_id)
+
+    _update(job_id, status="failed" if failures and failures == len(files) else "completed")
+
+def resume_interrupted_jobs():
+    """
+    Re-queue the files of jobs a previous process didn't finish (FastAPI startup).
+    Files whose upload is gone can't be resumed: their partial chunks are removed.
+    Returns the number of files re-queued.
+    """
+    jobs = {}
+    for pending in get_pending_ingests_db():
+        if not os.path.exists(pending["path"]):
+            delete_from_vector_store(pending["file_id"])
+            clear_ingest_checkpoint_db(pending["file_id"])
+            continue
+        jobs.setdefault(pending["job_id"], []).append(pending)
+
+    for job_id, files in jobs.items():
+        with _jobs_lock:
+            if job_id in _jobs:
+                continue
+        create_job(files[0]["user"], files[0]["session_id"], files, job_id=job_id)
+        submit_job(job_id)
+        logging.info(f"Resuming ingestion job {job_id} ({len(files)} file(s))")
+    return sum(len(files) for files in jobs.values())
@@ -0,0 +1,152 @@
+# backend/src/lexical_index.py
+# Persistent BM25 inverted index over the chunks written by process_document.
+# Postings are stored per source_id in SQLite, so a session's index is simply
+# the rows for its allowed source_ids; uploads add rows, deletes remove them,
+# and nothing is rebuilt at startup. Exact legal tokens such as "5(b)" or
+# "28" survive tokenization, which is where MiniLM embeddings fall short.
+import re
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)*(?:\([a-z0-9]+\))*|[a-z]+(?:'[a-z]+)?")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with",
+}
+
+def tokenize(text: str):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        # "5(b)" is also indexed as "5" so "Section 5" still matches it
+        if "(" in token:
+            tokens.append(token.split("(", 1)[0])
+    return tokens
+
+class LexicalIndex:
+    def __init__(self, db_path: str, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lex_chunks "
+            "(chunk_id TEXT PRIMARY KEY, source_id TEXT, length INTEGER, content TEXT, metadata TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lex_postings (term TEXT, source_id TEXT, chunk_id TEXT, tf INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lex_chunks_source ON lex_chunks(source_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lex_postings_term ON lex_postings(term, source_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lex_postings_source ON lex_postings(source_id)")
+        # add_chunks replaces a replayed batch's postings by chunk_id
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lex_postings_chunk ON lex_postings(chunk_id)")
+        self._conn.commit()
+
+    def add_chunks(self, source_id: str, chunk_ids, texts, metadatas):
+        chunk_rows, posting_rows = [], []
+        for chunk_id, text, metadata in zip(chunk_ids, texts, metadatas):
+            counts = Counter(tokenize(text))
+            chunk_rows.append((chunk_id, source_id, sum(counts.values()), text, json.dumps(metadata)))
+            posting_rows.extend((term, source_id, chunk_id, tf) for term, tf in counts.items())
+        chunk_ids = [row[0] for row in chunk_rows]
+        with self._lock:
+            # A replayed batch (crash-resume reuses deterministic chunk ids) replaces its
+            # postings instead of adding a second copy that would inflate tf and doc_freq
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                self._conn.execute(
+                    f"DELETE FROM lex_postings WHERE chunk_id IN ({','.join('?' * len(batch))})", batch
+                )
+            self._conn.executemany("INSERT OR REPLACE INTO lex_chunks VALUES (?, ?, ?, ?, ?)", chunk_rows)
+            self._conn.executemany("INSERT INTO lex_postings VALUES (?, ?, ?, ?)", posting_rows)
+            self._conn.commit()
+
+    def delete_source(self, source_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM lex_postings WHERE source_id = ?", (source_id,))
+            self._conn.execute("DELETE FROM lex_chunks WHERE source_id = ?", (source_id,))
+            self._conn.commit()
+
+    def scores(self, query: str, source_ids):
+        """BM25 score per chunk_id among `source_ids` (chunks matching no query term are left out)."""
+        terms = sorted(set(tokenize(query)))
+        source_ids = list(source_ids)
+        if not terms or not source_ids:
+            return Counter()
+
+        source_marks = ",".join("?" * len(source_ids))
+        term_marks = ",".join("?" * len(terms))
+        with self._lock:
+            n_docs, avg_len = self._conn.execute(
+                f"SELECT COUNT(*), AVG(length) FROM lex_chunks WHERE source_id IN ({source_marks})", source_ids
+            ).fetchone()
+            if not n_docs:
+                return Counter()
+            rows = self._conn.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, c.length FROM lex_postings p "
+                f"JOIN lex_chunks c ON c.chunk_id = p.chunk_id "
+                f"WHERE p.term IN ({term_marks}) AND p.source_id IN ({source_marks})",
+                [*terms, *source_ids],
+            ).fetchall()
+
+        doc_freq = Counter(term for term, _, _, _ in rows)
+        scores = Counter()
+        for term, chunk_id, tf, length in rows:
+            idf = math.log((n_docs - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5) + 1)
+            norm = tf + self.k1 * (1 - self.b + self.b * length / (avg_len or 1))
+            scores[chunk_id] += idf * tf * (self.k1 + 1) / norm
+        return scores
+
+    def search(self, query: str, source_ids, k: int = 8):
+        """Top-k chunks by BM25 among `source_ids`, as Documents (best first)."""
+        top = [chunk_id for chunk_id, _ in self.scores(query, source_ids).most_common(k)]
+        if not top:
+            return []
+        with self._lock:
+            found = {
+                chunk_id: (content, metadata)
+                for chunk_id, content, metadata in self._conn.execute(
+                    f"SELECT chunk_id, content, metadata FROM lex_chunks WHERE chunk_id IN ({','.join('?' * len(top))})",
+                    top,
+                )
+            }
+        return [
+            Document(page_content=found[c][0], metadata=json.loads(found[c][1]))
+            for c in top if c in found
+        ]
+
+    def rebuild_from_collection(self, collection, batch_size: int = 1000):
+        """Backfill from an existing Chroma collection (chunks ingested before this index existed)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM lex_postings")
+            self._conn.execute("DELETE FROM lex_chunks")
+            self._conn.commit()
+        offset = 0
+        while True:
+            batch = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            by_source = {}
+            for chunk_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"]):
+                source_id = (metadata or {}).get("source_id")
+                if source_id:
+                    by_source.setdefault(source_id, []).append((chunk_id, text, metadata))
+            for source_id, items in by_source.items():
+                ids, texts, metadatas = zip(*items)
+                self.add_chunks(source_id, ids, texts, metadatas)
+            offset += batch_size
+
+if __name__ == "__main__":
+    # One-off backfill: python -m backend.src.lexical_index
+    from backend.src.vector_store import get_vector_store, get_lexical_index
+    get_lexical_index().rebuild_from_collection(get_vector_store()._collection)
+    print("Lexical index rebuilt from the vector store.")
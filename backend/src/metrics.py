@@ -0,0 +1,106 @@
+# backend/src/metrics.py
+# Prometheus metrics, served in text format by GET /metrics.
+# Chat latency comes from the astream_events loop (EventTimer), ingest latency
+# from store_chunks, and cache counters are read at scrape time from the
+# counters the caches already keep, so nothing is counted twice.
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+
+REGISTRY = CollectorRegistry()
+
+# Seconds; the tail covers multi-minute PDF parses and slow provider answers
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "legalmind_stage_duration_seconds",
+    "Pipeline stage latency: retrieval, history_load, history_save per request; "
+    "parse (partitioning or transcription, plus chunking) per document; "
+    "transcribe_batch per batched image upload; embed and upsert per ingest batch",
+    ["stage"], buckets=BUCKETS, registry=REGISTRY,
+)
+TOOL_SECONDS = Histogram(
+    "legalmind_tool_duration_seconds", "Agent tool latency", ["tool"], buckets=BUCKETS, registry=REGISTRY,
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "legalmind_llm_first_token_seconds",
+    "Chat model time to first token; call='agent' for the answering model, 'internal' for tool-side calls",
+    ["call"], buckets=BUCKETS, registry=REGISTRY,
+)
+LLM_SECONDS = Histogram(
+    "legalmind_llm_duration_seconds", "Chat model total latency", ["call"], buckets=BUCKETS, registry=REGISTRY,
+)
+ACTIVE_STREAMS = Gauge("legalmind_active_streams", "/analyze responses currently streaming", registry=REGISTRY)
+STREAMS_TOTAL = Counter("legalmind_streams_total", "/analyze responses started", registry=REGISTRY)
+
+def timed(iterable, observe):
+    """Yield from `iterable`; once exhausted, pass observe() the total time spent producing items."""
+    iterator = iter(iterable)
+    total = 0.0
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            observe(total + time.perf_counter() - start)
+            return
+        total += time.perf_counter() - start
+        yield item
+
+class EventTimer:
+    """Feeds LLM and tool latencies from one astream_events(version='v2') run into the histograms."""
+    def __init__(self):
+        self._started = {}  # run_id -> (perf_counter at start, call label)
+        self._first_token = set()
+
+    def observe(self, event):
+        kind = event["event"]
+        run_id = event.get("run_id")
+        now = time.perf_counter()
+        if kind in ("on_chat_model_start", "on_tool_start"):
+            call = "internal" if "internal_retrieval" in event.get("tags", []) else "agent"
+            self._started[run_id] = (now, call)
+        elif kind == "on_chat_model_stream" and run_id in self._started and run_id not in self._first_token:
+            chunk = event["data"].get("chunk")
+            if getattr(chunk, "content", None) or getattr(chunk, "tool_call_chunks", None):
+                self._first_token.add(run_id)
+                start, call = self._started[run_id]
+                LLM_FIRST_TOKEN_SECONDS.labels(call).observe(now - start)
+        elif kind == "on_chat_model_end" and run_id in self._started:
+            start, call = self._started.pop(run_id)
+            if run_id not in self._first_token:
+                # Not streamed (or a cache hit): the first token came with the whole answer
+                LLM_FIRST_TOKEN_SECONDS.labels(call).observe(now - start)
+            self._first_token.discard(run_id)
+            LLM_SECONDS.labels(call).observe(now - start)
+        elif kind == "on_tool_end" and run_id in self._started:
+            start, _ = self._started.pop(run_id)
+            TOOL_SECONDS.labels(event["name"]).observe(now - start)
+
+class CacheCollector:
+    """legalmind_cache_events_total{cache, event} from the caches' own hit/miss counters."""
+    def collect(self):
+        # Imported here: metrics is imported by modules these depend on
+        from backend.src.core import get_embeddings, get_completion_cache, get_vision_service, is_loaded
+        from backend.src.retrieval_cache import retrieval_cache
+        from backend.src.web_search import get_web_search
+
+        sources = {"retrieval": retrieval_cache, "search": get_web_search()}
+        if is_loaded("completion_cache"):
+            sources["completions"] = get_completion_cache()
+        # Never load a model just to be scraped
+        if is_loaded("embeddings"):
+            sources["embeddings"] = get_embeddings()
+        if is_loaded("vision"):
+            sources["vision"] = get_vision_service().cache
+
+        family = CounterMetricFamily(
+            "legalmind_cache_events", "Cache hits, misses and evictions by cache", labels=["cache", "event"]
+        )
+        for name, cache in sources.items():
+            for event, count in dict(getattr(cache, "counters", None) or {}).items():
+                family.add_metric([name, event], count)
+        yield family
+
+REGISTRY.register(CacheCollector())
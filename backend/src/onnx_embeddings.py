@@ -0,0 +1,111 @@
+# backend/src/onnx_embeddings.py
+# Int8-quantized ONNX export of the sentence-transformers model, run with
+# onnxruntime on CPU. Mean pooling and L2 normalisation match the
+# all-MiniLM-L6-v2 pipeline, so vectors agree with the fp32 model to within
+# quantization error (see the parity test).
+#
+# Export once, on a machine that has the model:
+#   python -m backend.src.onnx_embeddings --output models/all-MiniLM-L6-v2-onnx-int8
+import os
+import argparse
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_dir: str, max_length: int = 256, batch_size: int = 64,
+                 threads: int = 0, normalize: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"No ONNX model at {model_path}; export it with `python -m backend.src.onnx_embeddings`"
+            )
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        self.normalize = normalize
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, feeds)[0]  # (batch, tokens, dim)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+def export_onnx(model_name: str, output_dir: str):
+    """Export the sentence-transformers transformer to ONNX and quantize its weights to int8."""
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    return export_transformer(st_model[0].auto_model, st_model.tokenizer, output_dir)
+
+def export_transformer(transformer, tokenizer, output_dir: str):
+    """Export a Hugging Face encoder and its fast tokenizer to `output_dir` as an int8 model."""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    transformer = transformer.eval()
+    tokenizer.backend_tokenizer.save(os.path.join(output_dir, TOKENIZER_FILE))
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+
+    fp32_path = os.path.join(output_dir, "model_fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    quantize_dynamic(fp32_path, os.path.join(output_dir, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    return output_dir
+
+if __name__ == "__main__":
+    from backend.config import EMBEDDING_MODEL, ONNX_EMBEDDING_PATH
+
+    parser = argparse.ArgumentParser(description="Export an int8 ONNX copy of the embedding model")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output", default=ONNX_EMBEDDING_PATH)
+    args = parser.parse_args()
+    print(f"Exported {args.model} to {export_onnx(args.model, args.output)}")
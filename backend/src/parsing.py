@@ -0,0 +1,117 @@
+# backend/src/parsing.py
+# Structural parsing for PDFs and Word documents.
+# This module must stay free of backend.src.core imports: it is executed inside
+# the ingestion process pool, and pulling in the embedding model or the LLM
+# client here would make every parse worker pay that load on spawn.
+import io
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_unstructured import UnstructuredLoader
+
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.tif', '.tiff']
+DOCUMENT_EXTENSIONS = ['.pdf', '.docx', '.doc']
+
+# Shared by the single-pass and the page-parallel path so both cut the same chunks
+CHUNKING_OPTIONS = {
+    "max_characters": 2000,
+    "new_after_n_chars": 1500,
+    "combine_text_under_n_chars": 500,
+}
+
+# Stateless, so one instance serves every call (and every thread)
+_clause_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=800,
+    chunk_overlap=100,
+    separators=["\n(a)", "\n(b)", "\n(c)", "\n(d)", "\n\n"]
+)
+
+def iter_refined(docs):
+    """Lazily split clauses (a), (b), (c), (d) of each chunk into smaller retrievable chunks."""
+    for doc in docs:
+        yield from _clause_splitter.create_documents([doc.page_content], metadatas=[doc.metadata])
+
+def refine_chunks(docs):
+    """Further split clauses (a), (b), (c), (d) into smaller retrievable chunks."""
+    return list(iter_refined(docs))
+
+def partition_document(file_path: str, content_type: str = None):
+    """Partition a PDF/Word file into title-based chunks. Runs in a worker process."""
+    # UnstructuredLoader handles .docx natively; a known content_type skips file-type detection
+    options = {"content_type": content_type} if content_type else {}
+    loader = UnstructuredLoader(
+        file_path,
+        chunking_strategy="by_title",
+        **options,
+        **CHUNKING_OPTIONS,
+    )
+    # Clause refinement happens lazily in the ingestion pipeline, not here
+    return loader.load()
+
+# --- PAGE-PARALLEL PDFs ---
+# A large PDF is split into page ranges that are partitioned (not chunked) in
+# the process pool. The elements are merged back in page order and chunked by
+# title once, in the caller, so a section that straddles a range seam ends up
+# in the same chunk it would have in a single pass.
+
+def count_pdf_pages(file_path: str):
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+def page_ranges(page_count: int, pages_per_range: int):
+    """[(first, last), ...] half-open, zero-based ranges covering every page."""
+    return [
+        (first, min(first + pages_per_range, page_count))
+        for first in range(0, page_count, pages_per_range)
+    ]
+
+def partition_pdf_pages(file_path: str, first: int, last: int):
+    """Partition pages [first, last) of a PDF into unchunked elements. Runs in a worker process."""
+    from pypdf import PdfReader, PdfWriter
+    from unstructured.partition.auto import partition
+
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for index in range(first, last):
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+
+    # Page numbers and the filename refer to the original document, not the slice
+    return partition(
+        file=buffer,
+        metadata_filename=file_path,
+        content_type="application/pdf",
+        starting_page_number=first + 1,
+    )
+
+def elements_to_documents(elements, file_path: str):
+    """Same Document shape as UnstructuredLoader: source + element metadata + category + element_id."""
+    docs = []
+    for element in elements:
+        data = element.to_dict()
+        metadata = {"source": file_path}
+        metadata.update(data.get("metadata") or {})
+        metadata["category"] = data.get("type")
+        metadata["element_id"] = data.get("element_id")
+        docs.append(Document(page_content=data.get("text") or "", metadata=metadata))
+    return docs
+
+def chunk_elements(elements, file_path: str):
+    """Chunk merged elements by title, as partition_document does."""
+    from unstructured.chunking.title import chunk_by_title
+
+    return elements_to_documents(chunk_by_title(elements, **CHUNKING_OPTIONS), file_path)
+
+def partition_pdf_parallel(file_path: str, executor, pages_per_range: int, page_count: int = None):
+    """Partition a PDF range by range on `executor` and chunk the merged result."""
+    if page_count is None:
+        page_count = count_pdf_pages(file_path)
+    futures = [
+        executor.submit(partition_pdf_pages, file_path, first, last)
+        for first, last in page_ranges(page_count, pages_per_range)
+    ]
+    # Collected in submission order, which is page order
+    elements = [element for future in futures for element in future.result()]
+    return chunk_elements(elements, file_path)
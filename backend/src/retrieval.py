@@ -0,0 +1,119 @@
+# backend/src/retrieval.py
+# Batched replacement for MultiQueryRetriever + per-variant MMR retrievers,
+# plus reciprocal-rank fusion with the BM25 lexical index.
+# The LLM variants are embedded in one call, Chroma is queried once with all
+# of their embeddings, and MMR re-ranking for every variant runs locally as a
+# single NumPy computation. Selection and ordering match the previous
+# MultiQueryRetriever(as_retriever(search_type="mmr")) pipeline.
+import numpy as np
+from langchain_core.documents import Document
+from langchain.retrievers.multi_query import DEFAULT_QUERY_PROMPT, LineListOutputParser
+
+def generate_query_variants(query: str, llm):
+    """Same prompt and parsing MultiQueryRetriever.from_llm uses."""
+    chain = DEFAULT_QUERY_PROMPT | llm | LineListOutputParser()
+    return chain.invoke({"question": query})
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+def mmr_select_batch(query_vectors, candidate_vectors, k: int, lambda_mult: float = 0.5):
+    """
+    Maximal marginal relevance for many queries at once.
+    query_vectors: V x d; candidate_vectors: list of V (n_i x d) arrays.
+    Returns, per query, the selected candidate indices in selection order
+    (same picks and tie-breaking as langchain's maximal_marginal_relevance).
+    """
+    n_queries = len(candidate_vectors)
+    counts = np.array([len(c) for c in candidate_vectors])
+    n_max = int(counts.max()) if n_queries else 0
+    if n_max == 0:
+        return [[] for _ in range(n_queries)]
+    dim = len(query_vectors[0])
+
+    # Pad candidates into one V x n x d tensor; padded rows are masked out
+    candidates = np.zeros((n_queries, n_max, dim), dtype=np.float64)
+    valid = np.zeros((n_queries, n_max), dtype=bool)
+    for v, c in enumerate(candidate_vectors):
+        if len(c):
+            candidates[v, :len(c)] = c
+            valid[v, :len(c)] = True
+
+    candidates = _normalize(candidates)
+    queries = _normalize(np.asarray(query_vectors, dtype=np.float64))
+    query_sim = np.einsum("vnd,vd->vn", candidates, queries)          # V x n
+    pairwise_sim = np.einsum("vnd,vmd->vnm", candidates, candidates)  # V x n x n
+
+    targets = np.minimum(counts, k)
+    rows = np.arange(n_queries)
+    selected = np.zeros((n_queries, n_max), dtype=bool)
+    max_sim_to_selected = np.full((n_queries, n_max), -np.inf, dtype=np.float64)
+    picks = [[] for _ in range(n_queries)]
+
+    for step in range(int(targets.max())):
+        if step == 0:
+            # First pick is simply the most similar candidate
+            scores = np.where(valid, query_sim, -np.inf)
+        else:
+            scores = lambda_mult * query_sim - (1 - lambda_mult) * max_sim_to_selected
+            scores = np.where(valid & ~selected, scores, -np.inf)
+        choice = np.argmax(scores, axis=1)
+
+        active = step < targets
+        for v in np.nonzero(active)[0]:
+            picks[v].append(int(choice[v]))
+        selected[rows[active], choice[active]] = True
+        max_sim_to_selected = np.maximum(max_sim_to_selected, pairwise_sim[rows, :, choice])
+
+    return picks
+
+def multi_query_search(query: str, source_ids: list, store, embeddings, llm,
+                       k: int = 8, fetch_k: int = 25, lambda_mult: float = 0.5):
+    """Unique union of per-variant MMR results, restricted to `source_ids`."""
+    variants = generate_query_variants(query, llm)
+    if not variants:
+        return []
+
+    if hasattr(embeddings, "embed_queries"):
+        query_vectors = embeddings.embed_queries(variants)
+    else:
+        query_vectors = [embeddings.embed_query(v) for v in variants]
+
+    results = store._collection.query(
+        query_embeddings=query_vectors,
+        n_results=fetch_k,
+        where={"source_id": {"$in": source_ids}},
+        include=["metadatas", "documents", "embeddings"],
+    )
+
+    dim = len(query_vectors[0])
+    candidate_vectors = [np.asarray(e, dtype=np.float64).reshape(len(e), dim) for e in results["embeddings"]]
+    picks = mmr_select_batch(query_vectors, candidate_vectors, k=k, lambda_mult=lambda_mult)
+
+    documents = []
+    for v, chosen in enumerate(picks):
+        # Chroma's MMR search returns the picks in candidate (distance) order
+        for i in sorted(chosen):
+            documents.append(Document(
+                page_content=results["documents"][v][i],
+                metadata=results["metadatas"][v][i] or {},
+            ))
+
+    # Unique union, as MultiQueryRetriever does
+    unique = []
+    for doc in documents:
+        if doc not in unique:
+            unique.append(doc)
+    return unique
+
+def reciprocal_rank_fusion(result_lists, k: int = 60):
+    """Fuse ranked Document lists: score = sum of 1 / (k + rank), keyed by page_content."""
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    # sorted() is stable, so ties keep first-seen order
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
@@ -0,0 +1,95 @@
+# backend/src/retrieval_cache.py
+# Result cache for rag_search_tool, keyed by (sorted allowed source_ids, normalized query).
+# Entries expire after a TTL, the cache is LRU-capped, and concurrent identical
+# lookups are coalesced so only one of them runs the retrieval pipeline.
+# Kept free of model imports: backend.database calls invalidate_sources().
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from backend.config import RETRIEVAL_CACHE_TTL_SECONDS, RETRIEVAL_CACHE_MAX_ENTRIES
+
+def normalize_query(query: str):
+    return " ".join(query.lower().split())
+
+class RetrievalCache:
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> Future shared by concurrent callers
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def get_or_compute(self, source_ids, query: str, compute):
+        key = (tuple(sorted(set(source_ids))), normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.counters["misses"] += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            # Only cache if no invalidation raced with the computation
+            if self._inflight.pop(key, None) is future:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def invalidate_sources(self, source_ids):
+        """Drop every entry whose allowed set touches one of `source_ids`."""
+        touched = set(source_ids)
+        if not touched:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if touched.intersection(k[0])]:
+                del self._entries[key]
+                self.counters["invalidations"] += 1
+            # In-flight results were computed against the old file set: don't cache them
+            for key in [k for k in self._inflight if touched.intersection(k[0])]:
+                del self._inflight[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+            served = self.counters["hits"] + self.counters["coalesced"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_ratio": served / lookups if lookups else 0.0,
+            }
+
+retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_TTL_SECONDS, RETRIEVAL_CACHE_MAX_ENTRIES)
@@ -1,21 +1,50 @@
 # backend/src/tools.py
-from langchain_core.tools import tool
-from langchain_community.utilities import SerpAPIWrapper
-from langchain.retrievers.multi_query import MultiQueryRetriever
-from backend.config import SERPAPI_API_KEY
-from backend.src.core import llm
-from backend.src.vector_store import get_vector_store, get_cosine_similarity
+import time
+from langchain_core.tools import StructuredTool, tool
+from backend.src.core import get_cached_llm, get_embeddings
+from backend.src.vector_store import get_vector_store, get_cosine_similarity, get_lexical_index
 from backend.src.context_vars import session_context
+from backend.src.retrieval import multi_query_search, reciprocal_rank_fusion
+from backend.src.retrieval_cache import retrieval_cache
+from backend.src.web_search import get_web_search
+from backend.src.metrics import STAGE_SECONDS
 from backend.database import get_session_files_db
 
 # --- CONFIG ---
 # We define a specialized LLM for internal tool operations (thinking/analysis).
 # We use the tag "internal_retrieval" because your chat.py is already configured 
 # to BLOCK stream events with this specific tag.
-internal_llm = llm.with_config(tags=["internal_retrieval"])
+# Calls go through the completion cache (LLM_CACHE_MODE), so repeated prompts skip OpenRouter.
+def get_internal_llm():
+    return get_cached_llm().with_config(tags=["internal_retrieval"])
 
 # --- TOOLS ---
 
+def _retrieve_chunks(query: str, allowed_file_ids: list):
+    """Hybrid retrieval restricted to the given source_ids, deduplicated."""
+    # One batched embed + one Chroma query for all LLM query variants, MMR done locally
+    vector_docs = multi_query_search(
+        query,
+        allowed_file_ids,
+        store=get_vector_store(),
+        embeddings=get_embeddings(),
+        llm=get_internal_llm(),
+        k=8,
+        fetch_k=25,
+    )
+    # BM25 catches exact tokens ("Section 5(b)", "Article 28") that embeddings miss
+    lexical_docs = get_lexical_index().search(query, allowed_file_ids, k=8)
+    docs = reciprocal_rank_fusion([vector_docs, lexical_docs])
+
+    # Deduplicate results
+    seen = set()
+    unique_docs = []
+    for d in docs:
+        if d.page_content not in seen:
+            seen.add(d.page_content)
+            unique_docs.append(d)
+    return unique_docs
+
 @tool
 def rag_search_tool(query: str) -> str:
     """
@@ -36,38 +65,15 @@ def rag_search_tool(query: str) -> str:
         print(f"⚠️ [RAG Tool] No files found for session {session_id}.")
         return "No documents found in this chat session. Please upload a document first."
 
-    # Extract just the list of file_ids
-    allowed_file_ids = [f['file_id'] for f in session_files]
-
-    # 3. Configure Vector Search with Strict Filtering
-    db = get_vector_store()
-
-    # The 'filter' argument ensures we ONLY get chunks where metadata['source_id'] matches one of our session files
-    base_retriever = db.as_retriever(
-        search_type="mmr", 
-        search_kwargs={
-            "k": 8, 
-            "fetch_k": 25,
-            "filter": {"source_id": {"$in": allowed_file_ids}} 
-        }
-    )
+    # Resolve to the vector-store source_ids (identical uploads share one set of chunks)
+    allowed_file_ids = sorted({f['source_id'] for f in session_files})
 
-    # 4. Use MultiQueryRetriever to expand queries dynamically
-    # CHANGE: Use the global internal_llm (tagged "internal_retrieval")
-    retriever = MultiQueryRetriever.from_llm(
-        retriever=base_retriever,
-        llm=internal_llm 
+    # 3. Retrieve (served from the cache when this file set + query was seen recently)
+    started = time.perf_counter()
+    unique_docs = retrieval_cache.get_or_compute(
+        allowed_file_ids, query, lambda: _retrieve_chunks(query, allowed_file_ids)
     )
-
-    docs = retriever.invoke(query)
-
-    # Deduplicate results
-    seen = set()
-    unique_docs = []
-    for d in docs:
-        if d.page_content not in seen:
-            seen.add(d.page_content)
-            unique_docs.append(d)
+    STAGE_SECONDS.labels("retrieval").observe(time.perf_counter() - started)
 
     if not unique_docs:
         print(f"❌ [RAG Tool] No results found for query '{query}' in session {session_id}.")  # DEBUG
@@ -94,28 +100,43 @@ def rag_search_tool(query: str) -> str:
         "- Do not paraphrase or add external context unless explicitly asked."
     )
 
-@tool
-def compliance_check_tool(query: str) -> str:
+def _compliance_prompt(query: str, search_results: str) -> str:
+    return f"Check regulatory compliance based on these search results:\n{search_results}\n\nQuery: {query}"
+
+def compliance_check(query: str) -> str:
     """
     Checks real-time regulatory compliance using web search.
     Use this to find current laws (GDPR, CCPA, etc.) or recent legal changes.
     """
-    search_results = ""
-    if SERPAPI_API_KEY:
-        try:
-            search = SerpAPIWrapper(serpapi_api_key=SERPAPI_API_KEY)
-            search_results = search.run(f"current legal regulations {query}")
-        except Exception as e:
-            search_results = f"Search failed: {e}"
-    else:
+    web_search = get_web_search()
+    if not web_search:
         return "Search API key is missing. Cannot check external compliance."
-    
-    prompt = f"Check regulatory compliance based on these search results:\n{search_results}\n\nQuery: {query}"
-    
+    try:
+        search_results = web_search.search_sync(f"current legal regulations {query}")
+    except Exception as e:
+        search_results = f"Search failed: {e!r}"
+
     # CHANGE: Use internal_llm to hide thinking from the stream
-    response = internal_llm.invoke(prompt)
+    response = get_internal_llm().invoke(_compliance_prompt(query, search_results))
     return getattr(response, "content", str(response))
 
+async def acompliance_check(query: str) -> str:
+    web_search = get_web_search()
+    if not web_search:
+        return "Search API key is missing. Cannot check external compliance."
+    try:
+        search_results = await web_search.search(f"current legal regulations {query}")
+    except Exception as e:
+        search_results = f"Search failed: {e!r}"
+
+    response = await get_internal_llm().ainvoke(_compliance_prompt(query, search_results))
+    return getattr(response, "content", str(response))
+
+# Sync and async bodies: the agent awaits the async one, .invoke gets the sync one
+compliance_check_tool = StructuredTool.from_function(
+    func=compliance_check, coroutine=acompliance_check, name="compliance_check_tool"
+)
+
 @tool
 def clause_comparison_tool(query: str) -> str:
     """
@@ -138,27 +159,12 @@ def clause_comparison_tool(query: str) -> str:
     Provide a legal analysis of differences."""
     
     # CHANGE: Use internal_llm to hide thinking from the stream
-    response = internal_llm.invoke(prompt)
+    response = get_internal_llm().invoke(prompt)
     return getattr(response, "content", str(response))
 
-@tool
-def citation_validation_tool(query: str) -> str:
-    """
-    Validates if a specific legal citation, case law, or statute is real and accurate.
-    Uses web search to verify existence.
-    """
-    validation_data = ""
-    if SERPAPI_API_KEY:
-        try:
-            search = SerpAPIWrapper(serpapi_api_key=SERPAPI_API_KEY)
-            validation_data = search.run(f"legal citation {query}")
-        except Exception as e:
-            validation_data = f"Search failed: {e}"
-    else:
-        return "Search API key missing. Cannot validate citation."
-
+def _citation_prompt(query: str, validation_data: str) -> str:
     # Strict instruction: do not infer content if exact text is missing
-    prompt = f"""
+    return f"""
 Validate this legal citation using the search data below.
 Data: {validation_data}
 Citation: {query}
@@ -168,10 +174,40 @@ STRICT INSTRUCTION:
 - If the exact text of the citation is not found, say: "I cannot find the exact wording, but the citation exists and is valid."
 - Do not infer or paraphrase the content of the citation.
 """
+
+def citation_validation(query: str) -> str:
+    """
+    Validates if a specific legal citation, case law, or statute is real and accurate.
+    Uses web search to verify existence.
+    """
+    web_search = get_web_search()
+    if not web_search:
+        return "Search API key missing. Cannot validate citation."
+    try:
+        validation_data = web_search.search_sync(f"legal citation {query}")
+    except Exception as e:
+        validation_data = f"Search failed: {e!r}"
+
     # CHANGE: Use internal_llm to hide thinking from the stream
-    response = internal_llm.invoke(prompt)
+    response = get_internal_llm().invoke(_citation_prompt(query, validation_data))
+    return getattr(response, "content", str(response))
+
+async def acitation_validation(query: str) -> str:
+    web_search = get_web_search()
+    if not web_search:
+        return "Search API key missing. Cannot validate citation."
+    try:
+        validation_data = await web_search.search(f"legal citation {query}")
+    except Exception as e:
+        validation_data = f"Search failed: {e!r}"
+
+    response = await get_internal_llm().ainvoke(_citation_prompt(query, validation_data))
     return getattr(response, "content", str(response))
 
+citation_validation_tool = StructuredTool.from_function(
+    func=citation_validation, coroutine=acitation_validation, name="citation_validation_tool"
+)
+
 
 # Export list of tools
 # note: calling the decorated function without () passes the tool object
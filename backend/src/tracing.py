@@ -0,0 +1,284 @@
+# backend/src/tracing.py
+# Opt-in traces of single /analyze requests, for admins chasing one slow answer.
+# The X-Trace header picks what is captured:
+#   events  every astream_events event with its offset from the request start,
+#           streamed chunk counts and token usage per LLM run, and the size of
+#           each tool's input and output (always on)
+#   cpu     a stack sampler over all threads (tools run in worker threads, which
+#           cProfile on the event loop would never see), reported as hot functions
+#   memory  tracemalloc allocation growth by line between request start and end
+# cpu and memory are process-wide: concurrent requests show up in them too.
+import os
+import sys
+import time
+import uuid
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+
+from backend.config import TRACE_MAX_ENTRIES, TRACE_MAX_EVENTS, TRACE_SAMPLE_INTERVAL_MS
+
+TRACE_HEADER = "X-Trace"
+TRACE_MODES = ("events", "cpu", "memory")
+TOP_N = 25
+
+# Frames a thread sits in while it has nothing to do; such samples are not hot spots
+IDLE_FRAMES = {("threading.py", "wait"), ("selectors.py", "select"), ("thread.py", "_worker"), ("queue.py", "get")}
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_trace_header(value: str):
+    """Set of requested modes, or None when tracing wasn't asked for. Any value turns on 'events'."""
+    requested = {mode.strip().lower() for mode in (value or "").split(",") if mode.strip()}
+    if not requested or requested & {"0", "false", "off"}:
+        return None
+    return {"events"} | (requested & set(TRACE_MODES))
+
+def _size(value):
+    if value is None:
+        return 0
+    content = getattr(value, "content", value)  # ToolMessage / AIMessage
+    return len(content if isinstance(content, (str, bytes)) else str(content))
+
+def _location(code):
+    path = os.path.relpath(code.co_filename, PROJECT_ROOT)
+    if path.startswith(".."):
+        path = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])  # site-packages etc.
+    return f"{path}:{code.co_firstlineno}({code.co_name})"
+
+class StackSampler:
+    """Every interval, record which function each busy thread is in (self) and every function on its stack."""
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self.samples = 0
+        self.self_counts = Counter()
+        self.stack_counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                code = frame.f_code
+                if thread_id == own or (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                self.samples += 1
+                self.self_counts[_location(code)] += 1
+                seen = set()
+                while frame is not None:
+                    location = _location(frame.f_code)
+                    if location not in seen:  # recursion counts once per sample
+                        seen.add(location)
+                        self.stack_counts[location] += 1
+                    frame = frame.f_back
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+        def top(counts):
+            return [
+                {"function": location, "samples": n, "share": round(n / self.samples, 4)}
+                for location, n in counts.most_common(TOP_N)
+            ]
+
+        own_code = {k: v for k, v in self.stack_counts.items() if k.startswith("backend/")}
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "self": top(self.self_counts),
+            "cumulative": top(self.stack_counts),
+            "cumulative_backend": top(Counter(own_code)),
+        }
+
+class _Tracemalloc:
+    """Refcounted tracemalloc, so overlapping memory traces share one tracer."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started_here = False
+
+    def acquire(self):
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self._started_here = True
+            self._users += 1
+        return tracemalloc.take_snapshot()
+
+    def release(self, before):
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._started_here:
+                tracemalloc.stop()
+                self._started_here = False
+        return {
+            "peak_traced_kb": round(peak / 1024, 1),
+            "top_growth": [
+                {
+                    "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in after.compare_to(before, "lineno")[:TOP_N]
+            ],
+        }
+
+_tracemalloc = _Tracemalloc()
+
+class RequestTrace:
+    def __init__(self, user: str, session_id: str, query: str, modes, max_events: int = TRACE_MAX_EVENTS,
+                 sample_interval_ms: float = TRACE_SAMPLE_INTERVAL_MS):
+        self.trace_id = uuid.uuid4().hex
+        self.user = user
+        self.session_id = session_id
+        self.query = query
+        self.modes = sorted(modes)
+        self.max_events = max_events
+        self.sample_interval_ms = sample_interval_ms
+        self.started_at = time.time()
+        self.status = "pending"
+        self.error = None
+        self.duration_ms = None
+        self.events = []
+        self.dropped_events = 0
+        self.runs = {}  # run_id -> waterfall row
+        self.profile = None
+        self.memory = None
+        self._t0 = time.perf_counter()
+        self._sampler = None
+        self._snapshot = None
+
+    def _now_ms(self):
+        return round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def _append(self, entry):
+        if len(self.events) < self.max_events:
+            self.events.append(entry)
+        else:
+            self.dropped_events += 1
+
+    def start(self):
+        """Start the profilers; event times stay relative to when the request came in."""
+        self.status = "running"
+        if "cpu" in self.modes:
+            self._sampler = StackSampler(self.sample_interval_ms)
+            self._sampler.start()
+        if "memory" in self.modes:
+            self._snapshot = _tracemalloc.acquire()
+
+    def mark(self, name: str, **fields):
+        """A step outside the agent run (history load/save) on the same timeline."""
+        self._append({"t_ms": self._now_ms(), "event": name, **fields})
+
+    def record(self, event):
+        """One astream_events(version='v2') event."""
+        kind = event["event"]
+        run_id = str(event.get("run_id"))
+        parents = event.get("parent_ids") or []
+        data = event.get("data") or {}
+        now = self._now_ms()
+        entry = {"t_ms": now, "event": kind, "name": event.get("name"), "run_id": run_id}
+        if parents:
+            entry["parent_id"] = str(parents[-1])
+        if event.get("tags"):
+            entry["tags"] = event["tags"]
+
+        if kind.endswith("_start"):
+            self.runs[run_id] = {
+                "run_id": run_id, "type": kind[3:-6], "name": event.get("name"),
+                "parent_id": entry.get("parent_id"), "start_ms": now, "end_ms": None,
+            }
+            if kind == "on_tool_start":
+                entry["input_chars"] = self.runs[run_id]["input_chars"] = _size(data.get("input"))
+        elif kind.endswith("_stream"):
+            chunk = data.get("chunk")
+            entry["chars"] = _size(chunk)
+            run = self.runs.get(run_id)
+            if run is not None:
+                run["chunks"] = run.get("chunks", 0) + 1
+                if entry["chars"] and "first_token_ms" not in run:
+                    run["first_token_ms"] = round(now - run["start_ms"], 3)
+        elif kind.endswith("_end"):
+            run = self.runs.get(run_id)
+            if run is not None:
+                run["end_ms"] = now
+                run["duration_ms"] = round(now - run["start_ms"], 3)
+            output = data.get("output")
+            if kind == "on_tool_end":
+                entry["output_chars"] = _size(output)
+                if run is not None:
+                    run["output_chars"] = entry["output_chars"]
+            elif kind == "on_chat_model_end":
+                usage = getattr(output, "usage_metadata", None)
+                entry["output_chars"] = _size(output)
+                entry["tokens"] = dict(usage) if usage else None
+                if run is not None:
+                    run["tokens"] = entry["tokens"]
+                    run["output_chars"] = entry["output_chars"]
+        self._append(entry)
+
+    def finish(self, error: str = None):
+        self.duration_ms = self._now_ms()
+        self.error = error
+        self.status = "failed" if error else "completed"
+        if self._sampler is not None:
+            self.profile = self._sampler.stop()
+            self._sampler = None
+        if self._snapshot is not None:
+            self.memory = _tracemalloc.release(self._snapshot)
+            self._snapshot = None
+
+    def summary(self):
+        return {
+            "trace_id": self.trace_id,
+            "user": self.user,
+            "session_id": self.session_id,
+            "modes": self.modes,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "events": len(self.events) + self.dropped_events,
+        }
+
+    def to_dict(self):
+        return {
+            **self.summary(),
+            "query": self.query,
+            "error": self.error,
+            # The waterfall: one row per LLM/tool/chain run, ordered by start
+            "runs": sorted(self.runs.values(), key=lambda run: run["start_ms"]),
+            "events": self.events,
+            "dropped_events": self.dropped_events,
+            "profile": self.profile,
+            "memory": self.memory,
+        }
+
+class TraceStore:
+    """The most recent traces by id, oldest evicted first."""
+    def __init__(self, max_entries: int = 100):
+        self.max_entries = max_entries
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: RequestTrace):
+        with self._lock:
+            self._traces[trace.trace_id] = trace
+            while len(self._traces) > self.max_entries:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str):
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def list(self):
+        with self._lock:
+            traces = list(self._traces.values())
+        return [trace.summary() for trace in reversed(traces)]
+
+trace_store = TraceStore(TRACE_MAX_ENTRIES)
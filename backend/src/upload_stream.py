@@ -0,0 +1,166 @@
+# backend/src/upload_stream.py
+# Streams multipart uploads from the request body straight to disk.
+# The body is parsed as it arrives instead of being spooled by Starlette first,
+# so an oversized request is rejected after at most MAX_UPLOAD_MB has been read
+# (or before reading anything, when Content-Length already says so). Each file
+# is hashed and MIME-sniffed in the same pass that writes it; disk writes and
+# hashing run in a worker thread, never on the event loop.
+import os
+import asyncio
+import hashlib
+from uuid import uuid4
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+FLUSH_BYTES = 1024 * 1024  # buffered per file before a write is handed to the thread pool
+SNIFF_BYTES = 16
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# (magic prefix, MIME type); the first match wins
+MIME_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+    (b"PK\x03\x04", "application/zip"),
+]
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadFormatError(Exception):
+    pass
+
+def sniff_mime(head: bytes, filename: str):
+    """MIME type from the leading bytes, or None if unrecognised. A .docx is a zip with a known extension."""
+    for magic, mime in MIME_SIGNATURES:
+        if head.startswith(magic):
+            if mime == "application/zip" and filename.lower().endswith(".docx"):
+                return DOCX_MIME
+            return mime
+    return None
+
+class _FilePart:
+    """One file field being written: buffered bytes, running hash and size."""
+    def __init__(self, filename: str, upload_dir: str):
+        self.filename = filename
+        self.file_id = str(uuid4())
+        self.path = os.path.join(upload_dir, f"{self.file_id}{os.path.splitext(filename)[1]}")
+        self.sha256 = hashlib.sha256()
+        self.head = b""
+        self.size = 0
+        self.pending = []
+        self.pending_bytes = 0
+        self.handle = None
+
+    def add(self, data: bytes):
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+        self.size += len(data)
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+
+    def flush(self):
+        """Write and hash the buffered bytes. Runs in a worker thread."""
+        if self.handle is None:
+            self.handle = open(self.path, "wb")
+        for data in self.pending:
+            self.sha256.update(data)
+            self.handle.write(data)
+        self.pending, self.pending_bytes = [], 0
+
+    def close(self):
+        self.flush()
+        self.handle.close()
+
+    def discard(self):
+        if self.handle is not None:
+            self.handle.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def result(self):
+        return {
+            "file_id": self.file_id,
+            "filename": self.filename,
+            "path": self.path,
+            "content_hash": self.sha256.hexdigest(),
+            "content_type": sniff_mime(self.head, self.filename),
+            "size": self.size,
+        }
+
+async def receive_uploads(request, upload_dir: str, max_bytes: int):
+    """
+    Save every file field of a multipart/form-data request under `upload_dir`.
+    Returns [{'file_id', 'filename', 'path', 'content_hash', 'content_type', 'size'}, ...].
+    Raises UploadTooLarge once the body exceeds `max_bytes` and UploadFormatError for
+    a body that isn't multipart; no partial file is left behind either way.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadFormatError("Expected a multipart/form-data body")
+
+    parts = []
+    state = {"headers": {}, "field": b"", "value": b"", "current": None}
+
+    def on_part_begin():
+        state["headers"], state["current"] = {}, None
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if filename:  # plain form fields carry nothing we need
+            state["current"] = _FilePart(os.path.basename(filename.decode("utf-8", "replace")), upload_dir)
+            parts.append(state["current"])
+
+    def on_part_data(data, start, end):
+        if state["current"] is not None:
+            state["current"].add(data[start:end])
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            parser.write(chunk)
+            full = [part for part in parts if part.pending_bytes >= FLUSH_BYTES]
+            if full:
+                await asyncio.to_thread(lambda: [part.flush() for part in full])
+        parser.finalize()
+        await asyncio.to_thread(lambda: [part.close() for part in parts])
+    except BaseException as e:
+        # Inline, not in a thread: this also runs when the client disconnects and we are cancelled
+        for part in parts:
+            part.discard()
+        if isinstance(e, MultipartParseError):
+            raise UploadFormatError(f"Malformed multipart body: {e}") from e
+        raise
+    return [part.result() for part in parts]
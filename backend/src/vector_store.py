@@ -1,11 +1,43 @@
 # backend/src/vector_store.py
+import threading
 import numpy as np
-from langchain_community.vectorstores import Chroma
-from backend.config import DB_DIR
-from backend.src.core import embeddings
+from backend.config import DB_DIR, LEXICAL_INDEX_DB
+from backend.src.core import get_embeddings
+from backend.src.lexical_index import LexicalIndex
+
+# One Chroma client/collection per process. Opening the persistent SQLite and
+# HNSW files is far more expensive than a query, so every caller shares this.
+_store = None
+_lexical_index = None
+_store_lock = threading.Lock()
+
+def init_vector_store():
+    """Open the shared store. Called from the FastAPI lifespan; safe to call repeatedly."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from langchain_community.vectorstores import Chroma
+                _store = Chroma(persist_directory=DB_DIR, embedding_function=get_embeddings())
+    return _store
+
+def get_lexical_index():
+    """BM25 postings for the same chunks, persisted next to the vector store. Opened on first use."""
+    global _lexical_index
+    if _lexical_index is None:
+        with _store_lock:
+            if _lexical_index is None:
+                _lexical_index = LexicalIndex(LEXICAL_INDEX_DB)
+    return _lexical_index
+
+def close_vector_store():
+    """Drop the shared handle on shutdown. Chroma persists on write, so nothing is flushed here."""
+    global _store
+    with _store_lock:
+        _store = None
 
 def get_vector_store():
-    return Chroma(persist_directory=DB_DIR, embedding_function=embeddings)
+    return _store if _store is not None else init_vector_store()
 
 def delete_from_vector_store(file_id: str):
     """Removes all chunks associated with a specific file_id."""
@@ -13,16 +45,18 @@ def delete_from_vector_store(file_id: str):
     # Chroma allows deletion by metadata filter
     try:
         # We need to ensure we query by the metadata 'source_id' we will inject
-        db._collection.delete(where={"source_id": file_id}) 
+        db._collection.delete(where={"source_id": file_id})
+        get_lexical_index().delete_source(file_id)
         return True
     except Exception as e:
         print(f"Vector delete error: {e}")
         return False
 
 def get_cosine_similarity(text1, text2):
+    embeddings = get_embeddings()
     vec1 = embeddings.embed_query(text1)
     vec2 = embeddings.embed_query(text2)
     dot_product = np.dot(vec1, vec2)
     norm1 = np.linalg.norm(vec1)
     norm2 = np.linalg.norm(vec2)
-    return dot_product / (norm1 * norm2) if norm1 > 0 and norm2 > 0 else 0.0
\ No newline at end of file
+    return dot_product / (norm1 * norm2) if norm1 > 0 and norm2 > 0 else 0.0
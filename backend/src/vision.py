@@ -0,0 +1,171 @@
+# backend/src/vision.py
+# LLM Vision transcription of image uploads.
+# Every page (each frame of a multi-page TIFF) is downscaled to
+# VISION_MAX_DIMENSION on its long edge and recompressed as JPEG before it is
+# sent, so phone scans cost a fraction of their original payload. Pages are
+# transcribed by async calls on one event loop thread owned by the service,
+# with at most VISION_CONCURRENCY requests in flight across all jobs.
+# Transcriptions are cached on disk by the hash of the prepared page, so
+# re-uploading an image never calls the model again.
+import io
+import os
+import time
+import base64
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+
+from PIL import Image, ImageOps, ImageSequence
+from langchain_core.messages import HumanMessage
+
+TRANSCRIBE_PROMPT = "Transcribe this legal document. Capture all headers and clauses accurately."
+
+def prepare_pages(file_path: str, max_dimension: int = 2048, quality: int = 85):
+    """JPEG bytes for every page of the image, no larger than max_dimension on either edge."""
+    pages = []
+    with Image.open(file_path) as image:
+        for frame in ImageSequence.Iterator(image):
+            page = ImageOps.exif_transpose(frame)  # phone photos are often stored sideways
+            if page.mode in ("RGBA", "LA", "P"):
+                # Transparent areas would turn black in JPEG; scans are dark text on white
+                rgba = page.convert("RGBA")
+                page = Image.new("RGB", rgba.size, "white")
+                page.paste(rgba, mask=rgba.getchannel("A"))
+            elif page.mode != "L":
+                page = page.convert("RGB")
+            page.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            page.save(buffer, format="JPEG", quality=quality, optimize=True)
+            pages.append(buffer.getvalue())
+    return pages
+
+class TranscriptionCache:
+    """Page transcriptions keyed by model name + SHA-256 of the prepared JPEG."""
+    def __init__(self, db_path: str, model_name: str):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcriptions (key TEXT PRIMARY KEY, text TEXT, created_at REAL)"
+        )
+        self._conn.commit()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def key(self, page: bytes):
+        return f"{self.model_name}:{hashlib.sha256(page).hexdigest()}"
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM transcriptions WHERE key = ?", (key,)).fetchone()
+            self.counters["hits" if row else "misses"] += 1
+        return row[0] if row else None
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO transcriptions VALUES (?, ?, ?)", (key, text, time.time()))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM transcriptions").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+class VisionService:
+    def __init__(self, llm_factory, cache: TranscriptionCache, concurrency: int = 4,
+                 max_dimension: int = 2048, quality: int = 85):
+        # The chat model is built on the service's own loop: its async HTTP client
+        # must not be shared with the FastAPI loop
+        self.llm_factory = llm_factory
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_dimension = max_dimension
+        self.quality = quality
+
+        self._llm = None
+        self._semaphore = None
+        self._in_flight = 0
+        self._stats = {"images": 0, "pages": 0, "model_calls": 0, "bytes_in": 0, "bytes_sent": 0}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="vision-service", daemon=True)
+        self._thread.start()
+
+    # --- CALLER SIDE (any thread) ---
+
+    def transcribe_batch(self, file_paths):
+        """
+        {path: [page text, ...]} for every image that could be transcribed; failures are
+        logged and left out so the caller can retry them one by one.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._transcribe_batch(list(file_paths)), self._loop)
+        return future.result()
+
+    def transcribe(self, file_path: str):
+        """Page texts of one image; raises if it can't be transcribed."""
+        future = asyncio.run_coroutine_threadsafe(self._transcribe_file(file_path), self._loop)
+        return future.result()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    # --- EVENT LOOP SIDE ---
+
+    async def _transcribe_batch(self, file_paths):
+        results = await asyncio.gather(*(self._transcribe_file(p) for p in file_paths), return_exceptions=True)
+        transcripts = {}
+        for path, result in zip(file_paths, results):
+            if isinstance(result, Exception):
+                logging.error(f"Vision transcription failed for {path}: {result}")
+            else:
+                transcripts[path] = result
+        return transcripts
+
+    async def _transcribe_file(self, file_path: str):
+        pages = await asyncio.to_thread(prepare_pages, file_path, self.max_dimension, self.quality)
+        self._stats["images"] += 1
+        self._stats["pages"] += len(pages)
+        self._stats["bytes_in"] += os.path.getsize(file_path)
+        return list(await asyncio.gather(*(self._transcribe_page(page) for page in pages)))
+
+    async def _transcribe_page(self, page: bytes):
+        key = self.cache.key(page)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._llm = self.llm_factory()
+        message = HumanMessage(
+            content=[
+                {"type": "text", "text": TRANSCRIBE_PROMPT},
+                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64.b64encode(page).decode('utf-8')}"}}
+            ]
+        )
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await self._llm.ainvoke([message])
+            finally:
+                self._in_flight -= 1
+        self._stats["model_calls"] += 1
+        self._stats["bytes_sent"] += len(page)
+
+        text = response.content.strip() if isinstance(response.content, str) else ""
+        if text:  # an empty answer is worth retrying on the next upload
+            await asyncio.to_thread(self.cache.put, key, text)
+        return text
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["in_flight"] = self._in_flight
+        stats["concurrency"] = self.concurrency
+        stats["max_dimension"] = self.max_dimension
+        stats["cache"] = self.cache.stats()
+        return stats
@@ -0,0 +1,49 @@
+# backend/src/warmup.py
+# Loads the models, agent and vector store ahead of the first request and
+# records how long each step took, for the /health/ready endpoint.
+import time
+import logging
+import threading
+
+from backend.src.core import get_embeddings, get_llm, get_cached_llm
+from backend.src.agent import get_agent_executor, get_history_window
+from backend.src.vector_store import init_vector_store, get_lexical_index
+
+_state = {"status": "pending", "started_at": None, "finished_at": None, "components": {}, "error": None}
+_state_lock = threading.Lock()
+
+def _load_embeddings():
+    # Touch the model once so the weights are resident, not just the wrapper
+    get_embeddings().underlying.embed_query("warm-up")
+
+STEPS = [
+    ("embeddings", _load_embeddings),
+    ("llm", lambda: (get_llm(), get_cached_llm())),
+    ("agent", lambda: (get_agent_executor(), get_history_window())),
+    ("vector_store", lambda: (init_vector_store(), get_lexical_index())),
+]
+
+def warm_up():
+    """Runs every step in order; safe to call again (each getter is idempotent)."""
+    with _state_lock:
+        _state.update(status="warming", started_at=time.time(), error=None)
+    try:
+        for name, step in STEPS:
+            start = time.perf_counter()
+            step()
+            with _state_lock:
+                _state["components"][name] = round(time.perf_counter() - start, 3)
+    except Exception as e:
+        logging.error(f"❌ Warm-up failed: {e}")
+        with _state_lock:
+            _state.update(status="failed", error=str(e), finished_at=time.time())
+        return False
+    with _state_lock:
+        _state.update(status="ready", finished_at=time.time())
+    logging.info(f"✅ Warm-up finished in {_state['finished_at'] - _state['started_at']:.2f}s: {_state['components']}")
+    return True
+
+def warmup_state():
+    with _state_lock:
+        state = {**_state, "components": dict(_state["components"])}
+    return state
@@ -0,0 +1,246 @@
+# backend/src/web_search.py
+# Web search behind compliance_check_tool and citation_validation_tool.
+# Providers keep one pooled async HTTP client per event loop (a client is bound
+# to the loop that first used it) plus a pooled sync client for sync tool calls,
+# all with a per-call timeout. Results are cached on disk by normalized query
+# for SEARCH_CACHE_TTL_SECONDS.
+# The fixture provider answers from a local JSON file for offline tests/benchmarks.
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+
+import httpx
+from langchain_community.utilities import SerpAPIWrapper
+
+from backend.config import (
+    SERPAPI_API_KEY, SEARCH_PROVIDER, SEARCH_FIXTURES, SEARCH_TIMEOUT_SECONDS,
+    SEARCH_CACHE_DB, SEARCH_CACHE_TTL_SECONDS
+)
+from backend.src.retrieval_cache import normalize_query
+
+NO_RESULT = "No good search result found"
+
+class SearchProvider:
+    name = "base"
+
+    async def search(self, query: str) -> str:
+        raise NotImplementedError
+
+    def search_sync(self, query: str) -> str:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+class SerpAPIProvider(SearchProvider):
+    name = "serpapi"
+    URL = "https://serpapi.com/search"
+    PARAMS = {"engine": "google", "google_domain": "google.com", "gl": "us", "hl": "en"}
+
+    def __init__(self, api_key: str, timeout: float):
+        self.api_key = api_key
+        self.timeout = timeout
+        self._clients = {}  # event loop -> AsyncClient
+        self._sync_client = None
+        self._client_lock = threading.Lock()
+
+    def _limits(self):
+        return httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        with self._client_lock:
+            client = self._clients.get(loop)
+            if client is None:
+                # Clients of loops that are gone can't be closed anymore; just drop them
+                for stale in [l for l in self._clients if l.is_closed()]:
+                    del self._clients[stale]
+                client = self._clients[loop] = httpx.AsyncClient(timeout=self.timeout, limits=self._limits())
+        return client
+
+    def _get_sync_client(self):
+        with self._client_lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(timeout=self.timeout, limits=self._limits())
+        return self._sync_client
+
+    def _params(self, query: str):
+        return {**self.PARAMS, "q": query, "api_key": self.api_key, "output": "json", "source": "python"}
+
+    @staticmethod
+    def _result(response):
+        response.raise_for_status()
+        # Same text the agent used to get from SerpAPIWrapper.run
+        return str(SerpAPIWrapper._process_response(response.json()))
+
+    async def search(self, query: str) -> str:
+        return self._result(await self._get_client().get(self.URL, params=self._params(query)))
+
+    def search_sync(self, query: str) -> str:
+        return self._result(self._get_sync_client().get(self.URL, params=self._params(query)))
+
+    async def aclose(self):
+        """Close the current loop's client and the sync one (FastAPI shutdown)."""
+        with self._client_lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+            sync_client, self._sync_client = self._sync_client, None
+        if client is not None:
+            await client.aclose()
+        if sync_client is not None:
+            sync_client.close()
+
+class FixtureSearchProvider(SearchProvider):
+    """Answers from a JSON file of {query: result}; `latency` simulates network time."""
+    name = "fixture"
+
+    def __init__(self, path: str, latency: float = 0.0):
+        with open(path, encoding="utf-8") as f:
+            self.results = {normalize_query(q): r for q, r in json.load(f).items()}
+        self.latency = latency
+
+    async def search(self, query: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.results.get(normalize_query(query), NO_RESULT)
+
+    def search_sync(self, query: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.results.get(normalize_query(query), NO_RESULT)
+
+class CachedSearch:
+    """
+    TTL cache in SQLite in front of a provider. Concurrent identical misses share
+    one provider call. Failures are raised, never cached.
+    """
+
+    def __init__(self, provider: SearchProvider, db_path: str, ttl_seconds: float, timeout: float):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        self._inflight = {}  # (loop, key) -> Task shared by concurrent identical searches
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, result TEXT, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def _key(self, query: str):
+        return f"{self.provider.name}:{normalize_query(query)}"
+
+    def _load(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM search_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _store(self, key: str, result: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?)", (key, result, time.time() + self.ttl_seconds)
+            )
+            # Expired rows are dropped lazily on write
+            self._conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    async def _fetch(self, key: str, query: str) -> str:
+        try:
+            result = await asyncio.wait_for(self.provider.search(query), timeout=self.timeout)
+        except Exception:
+            with self._lock:
+                self.counters["errors"] += 1
+            raise
+        await asyncio.to_thread(self._store, key, result)
+        return result
+
+    async def search(self, query: str) -> str:
+        key = self._key(query)
+        cached = await asyncio.to_thread(self._load, key)
+        if cached is not None:
+            with self._lock:
+                self.counters["hits"] += 1
+            return cached
+
+        # Tasks can only be awaited on their own loop
+        inflight_key = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(inflight_key)
+        if task is not None:
+            with self._lock:
+                self.counters["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        with self._lock:
+            self.counters["misses"] += 1
+        task = asyncio.ensure_future(self._fetch(key, query))
+        self._inflight[inflight_key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        return await asyncio.shield(task)
+
+    def search_sync(self, query: str) -> str:
+        """Blocking search() for sync tool calls; the provider's own client timeout applies."""
+        key = self._key(query)
+        cached = self._load(key)
+        if cached is not None:
+            with self._lock:
+                self.counters["hits"] += 1
+            return cached
+
+        with self._lock:
+            self.counters["misses"] += 1
+        try:
+            result = self.provider.search_sync(query)
+        except Exception:
+            with self._lock:
+                self.counters["errors"] += 1
+            raise
+        self._store(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        stats["provider"] = self.provider.name
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+def build_search_provider():
+    """Provider selected by SEARCH_PROVIDER, or None when web search is not configured."""
+    if SEARCH_PROVIDER == "fixture":
+        return FixtureSearchProvider(SEARCH_FIXTURES)
+    if SERPAPI_API_KEY:
+        return SerpAPIProvider(SERPAPI_API_KEY, timeout=SEARCH_TIMEOUT_SECONDS)
+    return None
+
+# Built on first use rather than at import: the cache opens SQLite
+_web_search = None
+_web_search_built = False
+_web_search_lock = threading.Lock()
+
+def get_web_search():
+    """The shared CachedSearch, or None when web search is not configured."""
+    global _web_search, _web_search_built
+    if not _web_search_built:
+        with _web_search_lock:
+            if not _web_search_built:
+                provider = build_search_provider()
+                if provider:
+                    _web_search = CachedSearch(
+                        provider, SEARCH_CACHE_DB, SEARCH_CACHE_TTL_SECONDS, timeout=SEARCH_TIMEOUT_SECONDS
+                    )
+                _web_search_built = True
+    return _web_search
+
+async def close_web_search():
+    """FastAPI shutdown; nothing to do if search was never used."""
+    if _web_search is not None:
+        await _web_search.aclose()
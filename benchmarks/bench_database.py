@@ -0,0 +1,80 @@
+# benchmarks/bench_database.py
+# get_user_sessions / get_session_files_db at 100k rows: pooled WAL connection
+# with indexes versus a fresh connection per call on unindexed tables.
+#
+#   python -m benchmarks.bench_database --rows 100000
+import os
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+def _seed(db_path, rows, users, sessions):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO sessions VALUES (?, ?, ?, ?)",
+        ((f"s{i}", f"user{i % users}", f"Session {i}", f"2024-01-01T00:00:{i:09d}") for i in range(rows)),
+    )
+    conn.executemany(
+        "INSERT INTO session_files (file_id, session_id, filename, created_at, source_id) VALUES (?, ?, ?, ?, ?)",
+        ((f"f{i}", f"s{i % sessions}", f"doc{i}.pdf", "2024-01-01", f"f{i}") for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+def _bench(label, fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<52} mean={statistics.mean(samples):8.3f} ms  p50={statistics.median(samples):8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_sqlite_"), "bench.db")
+    os.environ["SQLITE_DB"] = db_path  # must be set before backend.config is imported
+    from backend import database
+
+    database.init_db()
+    _seed(db_path, args.rows, users=1000, sessions=args.rows // 10)
+
+    user_args = [(f"user{i % 1000}",) for i in range(args.calls)]
+    file_args = [(f"s{i * 37 % (args.rows // 10)}",) for i in range(args.calls)]
+    print(f"{args.rows} sessions, {args.rows} session_files, {args.calls} calls each")
+
+    _bench("get_user_sessions (pooled, indexed)", database.get_user_sessions, user_args)
+    _bench("get_session_files_db (pooled, indexed)", database.get_session_files_db, file_args)
+
+    # Baseline: the previous connect-per-call layer against the same data without indexes
+    conn = database.get_connection()
+    with conn:
+        # The keyset index replaced idx_sessions_username_created (see _add_session_keyset_index)
+        conn.execute("DROP INDEX idx_sessions_username_created_id")
+        conn.execute("DROP INDEX idx_session_files_session")
+
+    def legacy_sessions(username):
+        c = sqlite3.connect(db_path)
+        rows = c.execute(
+            "SELECT session_id, title, created_at FROM sessions WHERE username = ? ORDER BY created_at DESC", (username,)
+        ).fetchall()
+        c.close()
+        return rows
+
+    def legacy_files(session_id):
+        c = sqlite3.connect(db_path)
+        rows = c.execute("SELECT file_id, filename FROM session_files WHERE session_id = ?", (session_id,)).fetchall()
+        c.close()
+        return rows
+
+    _bench("get_user_sessions (connect per call, no index)", legacy_sessions, user_args)
+    _bench("get_session_files_db (connect per call, no index)", legacy_files, file_args)
+    database.close_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_embedding_backends.py
+# Throughput of the fp32 PyTorch embeddings versus the int8 ONNX export on
+# contract-sized chunks, plus their cosine agreement. Needs the model
+# available locally and an export from `python -m backend.src.onnx_embeddings`.
+#
+#   python -m benchmarks.bench_embedding_backends --chunks 2000 --threads 4
+import time
+import argparse
+
+import numpy as np
+
+from backend.config import EMBEDDING_MODEL, ONNX_EMBEDDING_PATH
+from backend.src.onnx_embeddings import OnnxEmbeddings
+
+CLAUSE = ("{i}. The Supplier shall indemnify and hold harmless the Customer against all losses, "
+          "damages and costs arising out of any breach of clause {j}(b), including reasonable legal fees, "
+          "provided that the Customer notifies the Supplier in writing within {k} days of becoming aware of the claim.")
+
+def _throughput(label, model, texts, batch_size):
+    model.embed_documents(texts[:batch_size])  # warm-up
+    start = time.perf_counter()
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(model.embed_documents(texts[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {len(texts) / elapsed:9.1f} chunks/s  ({elapsed:.2f} s for {len(texts)} chunks)")
+    return np.asarray(vectors, dtype=np.float32)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="torch/onnxruntime intra-op threads (0 = default)")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--onnx-dir", default=ONNX_EMBEDDING_PATH)
+    args = parser.parse_args()
+
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    texts = [CLAUSE.format(i=i, j=i % 40, k=7 + i % 30) for i in range(args.chunks)]
+    fp32 = _throughput("torch fp32", HuggingFaceEmbeddings(model_name=args.model), texts, args.batch_size)
+    int8 = _throughput("onnx int8", OnnxEmbeddings(args.onnx_dir, threads=args.threads), texts, args.batch_size)
+
+    fp32 /= np.linalg.norm(fp32, axis=1, keepdims=True)
+    cosines = (fp32 * int8).sum(axis=1)
+    print(f"cosine agreement: mean={cosines.mean():.5f} min={cosines.min():.5f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# benchmarks/bench_embedding_service.py
+# Concurrent embed_query callers hitting the model directly versus going
+# through the micro-batching BatchingEmbeddings worker. The fake model has a
+# fixed per-call overhead and runs one forward pass at a time, like a
+# saturated CPU.
+#
+#   python -m benchmarks.bench_embedding_service --threads 32 --queries 50
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.src.embedding_service import BatchingEmbeddings
+from benchmarks.fakes import CostModelEmbeddings
+
+def _drive(model, threads, queries):
+    latencies = []
+
+    def caller(worker):
+        for i in range(queries):
+            start = time.perf_counter()
+            model.embed_query(f"worker {worker} query {i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(caller, range(threads)))
+    return time.perf_counter() - start, sorted(latencies)
+
+def _report(label, elapsed, latencies, total):
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22} {total / elapsed:9.0f} queries/s  p50={statistics.median(latencies):7.2f} ms  p99={p99:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50, help="per thread")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    total = args.threads * args.queries
+
+    print(f"{args.threads} threads x {args.queries} queries")
+    _report("direct model calls", *_drive(CostModelEmbeddings(), args.threads, args.queries), total)
+
+    service = BatchingEmbeddings(CostModelEmbeddings(), max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    _report("micro-batched worker", *_drive(service, args.threads, args.queries), total)
+    stats = service.stats()
+    service.close()
+    print(f"batches={stats['batches']} mean batch size={stats['mean_batch_size']}")
+    print(f"batch sizes: {stats['batch_size_histogram']}")
+
+if __name__ == "__main__":
+    main()
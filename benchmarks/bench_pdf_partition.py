@@ -0,0 +1,66 @@
+# benchmarks/bench_pdf_partition.py
+# Single-pass vs page-parallel partitioning of synthetic multi-hundred-page
+# PDFs. Both paths produce chunks; the benchmark checks they are identical
+# (text and page number) so the speed-up doesn't come from cutting corners.
+#
+#   python -m benchmarks.bench_pdf_partition --pages 200 400 --workers 4
+#   python -m benchmarks.bench_pdf_partition --pages 300 --pages-per-range 25 --json pdf.json
+import os
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.src.parsing import partition_document, partition_pdf_parallel
+from benchmarks.fakes import synthetic_contract_pdf
+
+def _signature(splits):
+    return [(doc.page_content, doc.metadata.get("page_number")) for doc in splits]
+
+def bench_pages(pages: int, workers: int, pages_per_range: int, tmpdir: str):
+    path = synthetic_contract_pdf(os.path.join(tmpdir, f"contract_{pages}.pdf"), pages)
+
+    start = time.perf_counter()
+    single = partition_document(path)
+    single_s = time.perf_counter() - start
+
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Spawn the workers and import unstructured before timing
+        list(pool.map(os.getpid, range(workers)))
+        start = time.perf_counter()
+        parallel = partition_pdf_parallel(path, pool, pages_per_range)
+        parallel_s = time.perf_counter() - start
+
+    result = {
+        "pages": pages,
+        "chunks": len(parallel),
+        "single_s": round(single_s, 2),
+        "parallel_s": round(parallel_s, 2),
+        "speedup": round(single_s / parallel_s, 2),
+        "pages_per_s": round(pages / parallel_s, 1),
+        "identical": _signature(single) == _signature(parallel),
+    }
+    print(f"{pages:>5} pages  {result['chunks']:>5} chunks  single={single_s:7.2f} s  "
+          f"parallel={parallel_s:7.2f} s  x{result['speedup']:.2f}  identical={result['identical']}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[200, 400])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--pages-per-range", type=int, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    print(f"workers={args.workers}  pages_per_range={args.pages_per_range}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = [bench_pages(p, args.workers, args.pages_per_range, tmpdir) for p in args.pages]
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_retrieval.py
+# Retrieval latency of the previous MultiQueryRetriever + per-variant MMR
+# retrievers against the batched multi_query_search, on the same store.
+# Also checks that both paths return the same documents.
+#
+#   python -m benchmarks.bench_retrieval --chunks 20000 --queries 100
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from langchain.retrievers.multi_query import MultiQueryRetriever
+from langchain_community.vectorstores import Chroma
+
+from backend.src.retrieval import multi_query_search
+from benchmarks.fakes import HashEmbeddings, variant_llm
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<28} mean={statistics.mean(samples):8.2f} ms  p50={statistics.median(samples):8.2f} ms  p99={p99:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--files", type=int, default=50)
+    args = parser.parse_args()
+
+    embeddings = HashEmbeddings()
+    persist_dir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        store = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+        for start in range(0, args.chunks, 2000):
+            batch = range(start, min(start + 2000, args.chunks))
+            store.add_texts(
+                [f"Section {i % 40}({'abcd'[i % 4]}): obligation {i} of the parties." for i in batch],
+                metadatas=[{"source_id": f"file-{i % args.files}"} for i in batch],
+            )
+
+        source_ids = [f"file-{i}" for i in range(0, args.files, 5)]
+        questions = [f"What does section {i % 40} require?" for i in range(args.queries)]
+
+        def legacy(question):
+            base = store.as_retriever(
+                search_type="mmr",
+                search_kwargs={"k": 8, "fetch_k": 25, "filter": {"source_id": {"$in": source_ids}}},
+            )
+            return MultiQueryRetriever.from_llm(retriever=base, llm=variant_llm()).invoke(question)
+
+        def batched(question):
+            return multi_query_search(question, source_ids, store=store, embeddings=embeddings, llm=variant_llm())
+
+        mismatches = sum(
+            [d.page_content for d in legacy(q)] != [d.page_content for d in batched(q)]
+            for q in questions[:10]
+        )
+
+        timings = {"legacy": [], "batched": []}
+        for question in questions:
+            for label, fn in (("legacy", legacy), ("batched", batched)):
+                start = time.perf_counter()
+                fn(question)
+                timings[label].append((time.perf_counter() - start) * 1000)
+
+        print(f"{args.chunks} chunks, {len(source_ids)} allowed files, {args.queries} queries, 3 variants each")
+        _report("MultiQuery + per-variant MMR", timings["legacy"])
+        _report("batched multi_query_search", timings["batched"])
+        print(f"result mismatches on 10 sampled queries: {mismatches}")
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_startup.py
+# Cold-start cost: seconds to `import backend.main` in a fresh interpreter,
+# and optionally seconds for the lifespan warm-up (model load) on top of it.
+# Each run is a new process so nothing is shared between samples.
+#
+#   python -m benchmarks.bench_startup --runs 5
+#   python -m benchmarks.bench_startup --runs 3 --warmup --json startup.json
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import backend.main
+result = {"import_s": time.perf_counter() - start}
+if WARMUP:
+    from backend.src.warmup import warm_up, warmup_state
+    start = time.perf_counter()
+    warm_up()
+    result["warmup_s"] = time.perf_counter() - start
+    result["components"] = warmup_state()["components"]
+print(json.dumps(result))
+"""
+
+def _run_once(warmup: bool):
+    out = subprocess.run(
+        [sys.executable, "-c", f"WARMUP = {warmup}\n{IMPORT_SNIPPET}"],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="also time warm_up() (loads the embedding model)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    samples = [_run_once(args.warmup) for _ in range(args.runs)]
+    summary = {"runs": args.runs, "import_s": statistics.median(s["import_s"] for s in samples)}
+    print(f"import backend.main   median={summary['import_s']:.2f} s  "
+          f"min={min(s['import_s'] for s in samples):.2f} s  max={max(s['import_s'] for s in samples):.2f} s")
+    if args.warmup:
+        summary["warmup_s"] = statistics.median(s["warmup_s"] for s in samples)
+        summary["components"] = samples[-1]["components"]
+        print(f"warm_up()             median={summary['warmup_s']:.2f} s  last run: {summary['components']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "samples": samples}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_vector_store.py
+# Per-query cost of constructing a Chroma store on every call (the old
+# get_vector_store) versus reusing one process-wide handle.
+#
+#   python -m benchmarks.bench_vector_store --chunks 5000 --queries 200
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from langchain_community.vectorstores import Chroma
+from benchmarks.fakes import HashEmbeddings
+
+def _timed(fn, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<24} mean={statistics.mean(samples):8.2f} ms  p50={statistics.median(samples):8.2f} ms  p99={p99:8.2f} ms")
+    return statistics.mean(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    embeddings = HashEmbeddings()
+    persist_dir = tempfile.mkdtemp(prefix="bench_chroma_")
+    try:
+        seed_store = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+        for start in range(0, args.chunks, 1000):
+            batch = range(start, min(start + 1000, args.chunks))
+            seed_store.add_texts(
+                [f"Clause {i}: the parties agree to term {i % 97}." for i in batch],
+                metadatas=[{"source_id": f"file-{i % 20}"} for i in batch],
+            )
+
+        queries = [f"What does term {i % 97} say?" for i in range(args.queries)]
+        search_filter = {"source_id": {"$in": ["file-1", "file-2", "file-3"]}}
+
+        def per_call(q):
+            db = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+            db.similarity_search(q, k=8, filter=search_filter)
+
+        shared = Chroma(persist_directory=persist_dir, embedding_function=embeddings)
+
+        def singleton(q):
+            shared.similarity_search(q, k=8, filter=search_filter)
+
+        print(f"{args.chunks} chunks, {args.queries} queries")
+        old = _report("new store per query", _timed(per_call, queries))
+        new = _report("shared store", _timed(singleton, queries))
+        print(f"overhead removed per query: {old - new:.2f} ms")
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_web_search.py
+# compliance/citation web search with and without the persistent TTL cache,
+# using the fixture provider with simulated network latency (no API key needed).
+#
+#   python -m benchmarks.bench_web_search --requests 200 --concurrency 20 --latency 0.4
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from backend.config import SEARCH_FIXTURES
+from backend.src.web_search import CachedSearch, FixtureSearchProvider
+
+def _report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<20} mean={statistics.mean(samples):8.2f} ms  p50={statistics.median(samples):8.2f} ms  p99={p99:8.2f} ms")
+
+async def _run(search, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await search(query)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(q) for q in queries))
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.4, help="simulated provider latency (s)")
+    args = parser.parse_args()
+
+    provider = FixtureSearchProvider(SEARCH_FIXTURES, latency=args.latency)
+    hot_queries = list(provider.results)
+    queries = [hot_queries[i % len(hot_queries)] for i in range(args.requests)]
+
+    with tempfile.TemporaryDirectory(prefix="bench_search_") as tmp:
+        cached = CachedSearch(provider, f"{tmp}/search_cache.db", ttl_seconds=3600, timeout=5)
+        print(f"{args.requests} requests over {len(hot_queries)} hot queries, concurrency {args.concurrency}")
+        _report("uncached", asyncio.run(_run(provider.search, queries, args.concurrency)))
+        _report("ttl cache", asyncio.run(_run(cached.search, queries, args.concurrency)))
+        print(f"cache: {cached.stats()}")
+
+if __name__ == "__main__":
+    main()
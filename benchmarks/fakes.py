@@ -0,0 +1,183 @@
+# benchmarks/fakes.py
+# Deterministic stand-ins for the embedding model and the chat LLM so the
+# benchmarks measure our code paths, not model load or network latency.
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DIM = 384  # all-MiniLM-L6-v2
+
+class HashEmbeddings(Embeddings):
+    """Unit vectors seeded from the text hash: identical text, identical vector."""
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+class CostModelEmbeddings(HashEmbeddings):
+    """
+    HashEmbeddings that also costs time like a CPU-bound model: a fixed
+    per-call overhead plus a per-text cost, one forward pass at a time.
+    """
+    def __init__(self, call_overhead_ms: float = 3.0, per_text_ms: float = 0.3):
+        self.call_overhead = call_overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self._busy = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._busy:
+            time.sleep(self.call_overhead + self.per_text * len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def variant_llm(variants=("What does the termination clause say?",
+                          "Which section covers termination?",
+                          "How can the agreement be terminated?")):
+    """Chat model that always answers with the same MultiQuery variants, one per line."""
+    return FakeListChatModel(responses=["\n".join(variants)])
+
+def synthetic_contract_pdf(path: str, pages: int, clauses_per_page: int = 12):
+    """
+    Text-only PDF shaped like a long contract: an ARTICLE heading every other
+    page and lettered clauses beneath it, so some sections straddle page ranges.
+    """
+    import pikepdf
+
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(pikepdf.Dictionary(
+        Type=pikepdf.Name.Font, Subtype=pikepdf.Name.Type1, BaseFont=pikepdf.Name.Helvetica,
+    ))
+    for page_no in range(pages):
+        lines = []
+        if page_no % 2 == 0:
+            lines.append((f"ARTICLE {page_no // 2 + 1}. OBLIGATIONS OF THE PARTIES", 14))
+        for i in range(clauses_per_page):
+            letter = "abcd"[i % 4]
+            lines.append((f"({letter}) Clause {page_no}.{i}: the Supplier shall deliver the Goods "
+                          f"and the Customer shall pay within {30 + i} days of invoice.", 9))
+        ops, y = [], 740
+        for text, size in lines:
+            ops.append(f"BT /F1 {size} Tf 40 {y} Td ({text}) Tj ET")
+            y -= size + 9
+        page = pdf.add_blank_page(page_size=(612, 792))
+        page.Resources = pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font))
+        page.Contents = pdf.make_stream("\n".join(ops).encode("latin-1"))
+    pdf.save(path)
+    return path
+
+STUB_ANSWER = (
+    "According to Section 4(b) of the agreement, the Supplier shall deliver the Goods within "
+    "thirty days and the Customer shall pay each invoice within forty-five days of receipt."
+)
+
+class StubChatModel(BaseChatModel):
+    """
+    Scripted tool-calling chat model for the agent. With tools bound, the first
+    turn calls rag_search_tool with the user's question and the turn after the
+    tool result streams STUB_ANSWER word by word; unbound (internal) calls answer
+    with MultiQuery variants. Delays imitate a remote model's latency profile.
+    """
+    answer: str = STUB_ANSWER
+    variants: List[str] = ["What does the termination clause say?", "Which section covers termination?"]
+    first_token_delay: float = 0.0
+    token_delay: float = 0.0
+    tools_bound: bool = False
+
+    @property
+    def _llm_type(self):
+        return "stub-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.__class__(**{**self.dict(), "tools_bound": True})
+
+    def _plan(self, messages):
+        """(text, tool_call or None) for this turn."""
+        if not self.tools_bound:
+            return "\n".join(self.variants), None
+        if isinstance(messages[-1], ToolMessage):
+            return self.answer, None
+        question = next(m.content for m in reversed(messages) if m.type == "human")
+        return "", {"name": "rag_search_tool", "args": {"query": question}, "id": "call_stub"}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, tool_call = self._plan(messages)
+        message = AIMessage(content=text, tool_calls=[tool_call] if tool_call else [])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, messages):
+        text, tool_call = self._plan(messages)
+        if tool_call:
+            yield AIMessageChunk(content="", tool_call_chunks=[{
+                "name": tool_call["name"], "args": json.dumps(tool_call["args"]), "id": tool_call["id"], "index": 0,
+            }])
+            return
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield AIMessageChunk(content=word if i == len(words) - 1 else word + " ")
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay)
+        for i, chunk in enumerate(self._chunks(messages)):
+            if i:
+                time.sleep(self.token_delay)
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        for i, chunk in enumerate(self._chunks(messages)):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+def synthetic_title_chunks(articles: int, clauses_per_article: int = 8):
+    """What partition_document returns for a contract: one ~1.5k-char chunk per ARTICLE."""
+    docs = []
+    for a in range(articles):
+        clauses = "\n".join(
+            f"({'abcd'[i % 4]}) Clause {a}.{i}: the Supplier shall deliver the Goods and the Customer "
+            f"shall pay within {30 + i} days of invoice, subject to Article {(a + i) % articles + 1}."
+            for i in range(clauses_per_article)
+        )
+        docs.append(Document(
+            page_content=f"ARTICLE {a + 1}. OBLIGATIONS OF THE PARTIES\n{clauses}",
+            metadata={"page_number": a // 2 + 1, "category": "CompositeElement"},
+        ))
+    return docs
+
+class StubParseExecutor:
+    """
+    Stands in for the Unstructured process pool in process_document: every parse
+    returns synthetic_title_chunks, so ingest benchmarks time refine -> clean ->
+    embed -> upsert without nltk data, OCR models or a PDF toolchain.
+    """
+    def __init__(self, articles: int):
+        self.articles = articles
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(synthetic_title_chunks(self.articles))
+        return future
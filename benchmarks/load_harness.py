@@ -0,0 +1,193 @@
+# benchmarks/load_harness.py
+# Load generator for a running backend. Each virtual user registers, logs in,
+# opens its own session and then loops: mostly /analyze streams, with an
+# /upload of a small synthetic scan mixed in at --upload-ratio. Reports
+# throughput, time to first byte and tail latency per endpoint as text and JSON.
+# Point the backend at the stub LLM so the numbers measure this service, not
+# the provider:
+#
+#   python -m benchmarks.stub_llm_server --port 8100 --profile typical
+#   LLM_BASE_URL=http://127.0.0.1:8100/v1 OPENROUTER_API_KEY=stub uvicorn backend.main:app --port 8000
+#   python -m benchmarks.load_harness --base-url http://127.0.0.1:8000 --users 50 --duration 60 --json load.json
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import statistics
+
+import httpx
+from PIL import Image, ImageDraw
+
+QUESTIONS = [
+    "What are the payment terms?",
+    "Summarise the termination clause.",
+    "Who bears liability for indirect damages?",
+    "Is there a confidentiality obligation after termination?",
+    "Which law governs this agreement?",
+]
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return {"n": 0}
+    samples = sorted(samples_ms)
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))], 3)
+
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(samples[-1], 3),
+    }
+
+def synthetic_scan(label: str):
+    """A small PNG 'scan' with unique text, so uploads are never deduplicated."""
+    image = Image.new("L", (850, 1100), 255)
+    draw = ImageDraw.Draw(image)
+    draw.text((60, 60), f"SERVICE AGREEMENT {label}", fill=0)
+    for line in range(30):
+        draw.text((60, 120 + line * 30), f"{line + 1}. The parties agree to clause {line + 1} of schedule {label}.", fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class Recorder:
+    def __init__(self):
+        self.samples = {"analyze": [], "upload": []}
+        self.errors = {"analyze": {}, "upload": {}, "setup": {}}
+        self.bytes = 0
+
+    def error(self, kind: str, reason: str):
+        self.errors[kind][reason] = self.errors[kind].get(reason, 0) + 1
+
+    def summary(self, elapsed: float):
+        report = {"elapsed_s": round(elapsed, 3), "bytes_streamed": self.bytes}
+        for kind, samples in self.samples.items():
+            report[kind] = {
+                "completed": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+                "ttfb": _percentiles([ttfb for ttfb, _ in samples]),
+                "total": _percentiles([total for _, total in samples]),
+                "errors": self.errors[kind],
+            }
+        report["setup_errors"] = self.errors["setup"]
+        return report
+
+async def _login(client, username: str, password: str):
+    await client.post("/register", json={"username": username, "password": password})
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def _analyze(client, headers, session_id, question, recorder):
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", "/analyze", json={"query": question, "session_id": session_id},
+                             headers=headers) as response:
+        if response.status_code != 200:
+            recorder.error("analyze", f"HTTP {response.status_code}")
+            return
+        async for chunk in response.aiter_bytes():
+            if chunk and ttfb is None:
+                ttfb = time.perf_counter() - start
+            recorder.bytes += len(chunk)
+    if ttfb is None:
+        recorder.error("analyze", "empty response")
+        return
+    recorder.samples["analyze"].append((ttfb * 1000, (time.perf_counter() - start) * 1000))
+
+async def _upload(client, headers, session_id, label, recorder):
+    files = {"files": (f"scan-{label}.png", synthetic_scan(label), "image/png")}
+    start = time.perf_counter()
+    response = await client.post("/upload", params={"session_id": session_id}, files=files, headers=headers)
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code != 202:
+        recorder.error("upload", f"HTTP {response.status_code}")
+        return
+    # The body arrives in one piece, so time to first byte is the time to the 202
+    recorder.samples["upload"].append((elapsed, elapsed))
+
+async def virtual_user(client, index, deadline, args, recorder):
+    rng = random.Random(args.seed + index)
+    try:
+        headers = await _login(client, f"load-{args.run_id}-{index}", "load-test-password")
+        response = await client.post("/sessions", json={"title": f"Load test {index}"}, headers=headers)
+        response.raise_for_status()
+        session_id = response.json()["session_id"]
+    except (httpx.HTTPError, KeyError) as e:
+        recorder.error("setup", type(e).__name__)
+        return
+
+    # Start times are spread over the ramp-up so the server isn't hit by one burst
+    await asyncio.sleep(args.ramp_up * index / max(1, args.users))
+    iteration = 0
+    while time.perf_counter() < deadline:
+        iteration += 1
+        kind = "upload" if rng.random() < args.upload_ratio else "analyze"
+        try:
+            if kind == "upload":
+                await _upload(client, headers, session_id, f"{args.run_id}-{index}-{iteration}", recorder)
+            else:
+                await _analyze(client, headers, session_id, rng.choice(QUESTIONS), recorder)
+        except httpx.HTTPError as e:
+            recorder.error(kind, type(e).__name__)
+        if args.think_ms:
+            await asyncio.sleep(rng.expovariate(1000 / args.think_ms))
+
+async def run(args):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + args.ramp_up + args.duration
+        await asyncio.gather(*(virtual_user(client, i, deadline, args, recorder) for i in range(args.users)))
+        elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed)
+
+def _report(label, stats):
+    if not stats["n"]:
+        print(f"{label:<24} no samples")
+        return
+    print(f"{label:<24} p50={stats['p50_ms']:9.2f} ms  p95={stats['p95_ms']:9.2f} ms  "
+          f"p99={stats['p99_ms']:9.2f} ms  max={stats['max_ms']:9.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /analyze and /upload load against a running backend")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of steady load after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which users start")
+    parser.add_argument("--upload-ratio", type=float, default=0.1, help="share of iterations that upload")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean pause between a user's requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+    args.run_id = uuid.uuid4().hex[:8]
+
+    results = asyncio.run(run(args))
+    results["meta"] = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args)}
+
+    print(f"\n{args.users} users, {results['elapsed_s']:.1f} s against {args.base_url}")
+    for kind in ("analyze", "upload"):
+        stats = results[kind]
+        print(f"\n[{kind}] {stats['completed']} completed, {stats['throughput_rps']:.2f} req/s, errors: {stats['errors'] or 'none'}")
+        _report("time to first byte", stats["ttfb"])
+        _report("full response", stats["total"])
+    if results["setup_errors"]:
+        print(f"\nsetup errors: {results['setup_errors']}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# benchmarks/stub_llm_server.py
+# Local OpenAI-compatible chat completions server for load tests, so the
+# backend can be driven hard without spending OpenRouter credits. It follows
+# the same script as fakes.StubChatModel: with tools offered, the first turn
+# streams a rag_search_tool call and the turn after the tool result streams an
+# answer; plain prompts (MultiQuery variants, summaries) and vision prompts get
+# canned text. Latency is shaped by a profile: time to first token, tokens per
+# second, jitter, and how many completions the "provider" serves at once.
+#
+#   python -m benchmarks.stub_llm_server --port 8100 --profile typical
+#   LLM_BASE_URL=http://127.0.0.1:8100/v1 OPENROUTER_API_KEY=stub uvicorn backend.main:app
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fakes import STUB_ANSWER
+
+PROFILES = {
+    # first_token_ms, tokens_per_s (0 = no delay), jitter (fraction of each delay), max_concurrency (0 = unlimited)
+    "instant": {"first_token_ms": 0, "tokens_per_s": 0, "jitter": 0.0, "max_concurrency": 0},
+    "fast": {"first_token_ms": 150, "tokens_per_s": 150, "jitter": 0.1, "max_concurrency": 0},
+    "typical": {"first_token_ms": 600, "tokens_per_s": 40, "jitter": 0.25, "max_concurrency": 64},
+    "slow": {"first_token_ms": 2000, "tokens_per_s": 12, "jitter": 0.5, "max_concurrency": 16},
+}
+
+VARIANTS = "What does the termination clause say?\nWhich section covers termination?\nHow can the agreement be terminated?"
+TRANSCRIPTION = (
+    "ARTICLE 4. PAYMENT\n(a) The Customer shall pay each invoice within forty-five days of receipt.\n"
+    "(b) Late payments accrue interest at one percent per month.\n"
+    "(c) The Supplier may suspend delivery while any invoice is more than sixty days overdue."
+)
+
+def _text(content):
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content or [] if isinstance(part, dict))
+
+def _has_image(messages):
+    return any(
+        isinstance(m.get("content"), list) and any(p.get("type") == "image_url" for p in m["content"])
+        for m in messages
+    )
+
+def plan(body):
+    """(text, tool_call or None) for a chat completions request body."""
+    messages = body.get("messages", [])
+    tool_names = [t["function"]["name"] for t in body.get("tools", []) if t.get("type") == "function"]
+    if _has_image(messages):
+        return TRANSCRIPTION, None
+    if not tool_names:
+        return VARIANTS, None
+    if messages and messages[-1].get("role") == "tool":
+        return STUB_ANSWER, None
+    question = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+    name = "rag_search_tool" if "rag_search_tool" in tool_names else tool_names[0]
+    return "", {"id": f"call_{uuid.uuid4().hex[:12]}", "name": name, "arguments": json.dumps({"query": question})}
+
+def _tokens(text):
+    words = text.split(" ")
+    return [w if i == len(words) - 1 else w + " " for i, w in enumerate(words)]
+
+class StubProvider:
+    def __init__(self, first_token_ms: float, tokens_per_s: float, jitter: float, max_concurrency: int, seed: int = 0):
+        self.first_token = first_token_ms / 1000
+        self.token_interval = 1 / tokens_per_s if tokens_per_s else 0.0
+        self.jitter = jitter
+        self.seed = seed
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.stats = {"requests": 0, "streams": 0, "in_flight": 0, "queued": 0, "tokens": 0, "tool_calls": 0}
+
+    def _rng(self, body):
+        # Same request, same delays: runs are reproducible
+        digest = hashlib.sha256(json.dumps(body.get("messages", []), sort_keys=True).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "little") ^ self.seed)
+
+    def _delay(self, rng, base):
+        return max(0.0, base * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    async def _slot(self):
+        if self._semaphore is None:
+            return None
+        self.stats["queued"] += 1
+        await self._semaphore.acquire()
+        self.stats["queued"] -= 1
+        return self._semaphore
+
+    def _chunk(self, completion_id, model, delta, finish_reason=None):
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream(self, body):
+        text, tool_call = plan(body)
+        rng = self._rng(body)
+        model = body.get("model", "stub")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        slot = await self._slot()
+        self.stats["in_flight"] += 1
+        try:
+            await asyncio.sleep(self._delay(rng, self.first_token))
+            yield self._chunk(completion_id, model, {"role": "assistant", "content": ""})
+            if tool_call:
+                self.stats["tool_calls"] += 1
+                yield self._chunk(completion_id, model, {"tool_calls": [{
+                    "index": 0, "id": tool_call["id"], "type": "function",
+                    "function": {"name": tool_call["name"], "arguments": ""},
+                }]})
+                arguments = tool_call["arguments"]
+                step = max(1, len(arguments) // 3)
+                for start in range(0, len(arguments), step):
+                    await asyncio.sleep(self._delay(rng, self.token_interval))
+                    yield self._chunk(completion_id, model, {"tool_calls": [{
+                        "index": 0, "function": {"arguments": arguments[start:start + step]},
+                    }]})
+                finish_reason = "tool_calls"
+            else:
+                for i, token in enumerate(_tokens(text)):
+                    if i:
+                        await asyncio.sleep(self._delay(rng, self.token_interval))
+                    self.stats["tokens"] += 1
+                    yield self._chunk(completion_id, model, {"content": token})
+                finish_reason = "stop"
+            yield self._chunk(completion_id, model, {}, finish_reason)
+            yield "data: [DONE]\n\n"
+        finally:
+            self.stats["in_flight"] -= 1
+            if slot:
+                slot.release()
+
+    async def complete(self, body):
+        text, tool_call = plan(body)
+        rng = self._rng(body)
+        slot = await self._slot()
+        self.stats["in_flight"] += 1
+        try:
+            tokens = _tokens(text)
+            await asyncio.sleep(self._delay(rng, self.first_token + self.token_interval * max(0, len(tokens) - 1)))
+        finally:
+            self.stats["in_flight"] -= 1
+            if slot:
+                slot.release()
+        self.stats["tokens"] += len(tokens) if text else 0
+        message = {"role": "assistant", "content": text or None}
+        if tool_call:
+            self.stats["tool_calls"] += 1
+            message["tool_calls"] = [{
+                "id": tool_call["id"], "type": "function",
+                "function": {"name": tool_call["name"], "arguments": tool_call["arguments"]},
+            }]
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+        }
+
+def create_app(provider: StubProvider):
+    app = FastAPI(title="Stub OpenAI-compatible LLM")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        provider.stats["requests"] += 1
+        if body.get("stream"):
+            provider.stats["streams"] += 1
+            return StreamingResponse(provider.stream(body), media_type="text/event-stream")
+        return JSONResponse(await provider.complete(body))
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "benchmarks"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return provider.stats
+
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM with latency profiles")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="typical")
+    parser.add_argument("--first-token-ms", type=float, help="override the profile")
+    parser.add_argument("--tokens-per-s", type=float, help="override the profile (0 = no delay)")
+    parser.add_argument("--jitter", type=float, help="override the profile, e.g. 0.25 = +/-25%%")
+    parser.add_argument("--max-concurrency", type=int, help="override the profile (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profile = dict(PROFILES[args.profile])
+    for key in profile:
+        if getattr(args, key) is not None:
+            profile[key] = getattr(args, key)
+    print(f"stub LLM on http://{args.host}:{args.port}/v1  profile={args.profile} {profile}")
+    uvicorn.run(create_app(StubProvider(**profile, seed=args.seed)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
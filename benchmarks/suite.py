@@ -0,0 +1,437 @@
+# benchmarks/suite.py
+# Offline regression suite. Everything runs against deterministic fakes (hash
+# embeddings, a scripted tool-calling chat model, synthetic contracts) in a
+# throw-away working directory, so numbers are comparable between releases
+# and no model download or API key is needed.
+#
+#   sqlite     session create/list/history/delete p50/p99 on a seeded database
+#   retrieval  rag_search_tool p50/p99 as the corpus grows (1k ... 1M chunks)
+#   ingest     process_document throughput in chunks/s (parse stage stubbed)
+#   analyze    /analyze time-to-first-byte and total time over real HTTP
+#   login      /analyze stream stalls while a burst of /token logins runs bcrypt
+#
+#   python -m benchmarks.suite --json results.json
+#   python -m benchmarks.suite --only retrieval --corpus 1000 100000 1000000 --json retrieval.json
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+from contextlib import contextmanager, redirect_stdout
+
+SCENARIOS = ("sqlite", "retrieval", "ingest", "analyze", "login")
+SEED_BATCH = 5000  # below Chroma's max batch size
+CHUNKS_PER_FILE = 200
+SESSION_FILES = 5
+
+# The agent (verbose=True) and the RAG tool print as they work; results go to the real stdout
+_out = sys.stdout
+
+def _print(*args):
+    print(*args, file=_out, flush=True)
+
+def _percentiles(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+    }
+
+def _report(label, stats):
+    _print(f"{label:<36} mean={stats['mean_ms']:9.2f} ms  p50={stats['p50_ms']:9.2f} ms  p99={stats['p99_ms']:9.2f} ms")
+
+def _timed(fn, calls):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return _percentiles(samples)
+
+# --- ENVIRONMENT ---
+
+def configure_environment(workdir: str):
+    """Point every path the backend writes to at `workdir`. Must run before backend is imported."""
+    os.environ.update({
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "DB_DIR": os.path.join(workdir, "chroma_db"),
+        "SQLITE_DB": os.path.join(workdir, "bench.db"),
+        "EMBEDDING_CACHE_DB": os.path.join(workdir, "embedding_cache.db"),
+        "SEARCH_CACHE_DB": os.path.join(workdir, "search_cache.db"),
+        "TRANSCRIPTION_CACHE_DB": os.path.join(workdir, "transcription_cache.db"),
+        "AUDIT_DIR": os.path.join(workdir, "audit"),
+        "SEARCH_PROVIDER": "fixture",
+        "SEARCH_FIXTURES": os.path.abspath(os.path.join(os.path.dirname(__file__), "fixtures", "search_results.json")),
+        "LLM_CACHE_MODE": "off",
+        "DEBUG_MODE": "false",
+    })
+
+def install_fakes(first_token_delay: float, token_delay: float):
+    """Pre-seed the lazy model getters in backend.src.core with the fakes."""
+    from backend.config import EMBEDDING_CACHE_DB
+    from backend.src import core
+    from backend.src.embedding_cache import CachedEmbeddings
+    from benchmarks.fakes import HashEmbeddings, StubChatModel
+
+    core._instances["embeddings"] = CachedEmbeddings(HashEmbeddings(), model_name="hash", db_path=EMBEDDING_CACHE_DB)
+    core._instances["llm"] = StubChatModel(first_token_delay=first_token_delay, token_delay=token_delay)
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+# --- SCENARIOS ---
+
+def bench_sqlite(sessions: int, messages: int, calls: int):
+    from backend.database import (
+        init_db, create_session_db, get_user_sessions, get_session_messages_db, delete_session_db
+    )
+    from backend.src.agent import get_session_history
+
+    init_db()
+    users = [f"bench-user-{i}" for i in range(max(1, sessions // 100))]
+    session_ids = [create_session_db(users[i % len(users)], f"Matter {i}")[0] for i in range(sessions)]
+    busy = session_ids[0]
+    history = get_session_history(busy)
+    for i in range(messages // 2):
+        history.add_user_message(f"Question {i} about the indemnity clause?")
+        history.add_ai_message(f"Answer {i}: Section {i % 40} caps liability at the fees paid.")
+
+    created = []
+    results = {
+        "sessions": sessions,
+        "messages": messages,
+        "create_session": _timed(lambda i: created.append(create_session_db(users[0], f"New {i}")[0]), calls),
+        "list_sessions": _timed(lambda i: get_user_sessions(users[i % len(users)], limit=50), calls),
+        "load_history_page": _timed(lambda i: get_session_messages_db(busy, limit=50), calls),
+        "append_message": _timed(lambda i: get_session_history(created[i]).add_user_message(f"Hello {i}"), calls),
+        "delete_session": _timed(lambda i: delete_session_db(created[i], users[0]), calls),
+    }
+    _print(f"\n[sqlite] {sessions} sessions, {messages} messages in the busiest one")
+    for op in ("create_session", "list_sessions", "load_history_page", "append_message", "delete_session"):
+        _report(op, results[op])
+    return results
+
+class RetrievalCorpus:
+    """Grows one Chroma collection + BM25 index in place and attaches a session to a few of its files."""
+    def __init__(self):
+        from backend.database import init_db, create_session_db, attach_content_db
+
+        init_db()
+        self.size = 0
+        self.session_id, _ = create_session_db("bench-retrieval", "Retrieval corpus")
+        for f in range(SESSION_FILES):
+            # The session always owns the first files; the rest of the corpus is other users' data
+            attach_content_db(self.session_id, f"contract{f}.pdf", f"upload-{uuid.uuid4()}", f"hash-{uuid.uuid4()}",
+                              source_id=f"file-{f}", chunks=CHUNKS_PER_FILE)
+
+    def grow_to(self, size: int):
+        from backend.src.core import get_embeddings
+        from backend.src.vector_store import get_vector_store, get_lexical_index
+
+        store, embeddings = get_vector_store(), get_embeddings().underlying  # seed without filling the cache
+        start = time.perf_counter()
+        for first in range(self.size, size, SEED_BATCH):
+            indices = range(first, min(first + SEED_BATCH, size))
+            texts = [
+                f"Section {i % 40}({'abcd'[i % 4]}): the {('Supplier', 'Customer', 'Licensee')[i % 3]} "
+                f"shall perform obligation {i} within {i % 90} days." for i in indices
+            ]
+            ids = [f"chunk-{i}" for i in indices]
+            metadatas = [{"source_id": f"file-{i // CHUNKS_PER_FILE}"} for i in indices]
+            store._collection.upsert(ids=ids, embeddings=embeddings.embed_documents(texts),
+                                     metadatas=metadatas, documents=texts)
+            by_source = {}
+            for row in zip(ids, texts, metadatas):
+                by_source.setdefault(row[2]["source_id"], []).append(row)
+            for source_id, rows in by_source.items():
+                get_lexical_index().add_chunks(source_id, *map(list, zip(*rows)))
+        self.size = max(self.size, size)
+        return time.perf_counter() - start
+
+def bench_retrieval(corpus: RetrievalCorpus, sizes, queries: int):
+    from backend.src.tools import rag_search_tool
+    from backend.src.context_vars import session_context
+
+    results = []
+    _print(f"\n[retrieval] rag_search_tool over a {SESSION_FILES}-file session, {queries} distinct queries per size")
+    for size in sorted(sizes):
+        seed_s = corpus.grow_to(size)
+        token = session_context.set(corpus.session_id)
+        try:
+            # Distinct queries: every call misses the retrieval cache and runs the full hybrid search
+            run = uuid.uuid4().hex[:6]
+            rag_search_tool.invoke(f"warm-up {run}")
+            stats = _timed(lambda i: rag_search_tool.invoke(f"What does section {i % 40} require ({run}-{i})?"), queries)
+        finally:
+            session_context.reset(token)
+        results.append({"chunks": size, "seed_s": round(seed_s, 2), **stats})
+        _report(f"{size:>9} chunks", stats)
+    return results
+
+def bench_ingest(documents: int, articles: int):
+    from backend.config import UPLOAD_DIR
+    from backend.src.document_processor import process_document
+    from benchmarks.fakes import StubParseExecutor
+
+    executor = StubParseExecutor(articles)
+    total_chunks = 0
+    start = time.perf_counter()
+    for d in range(documents):
+        path = os.path.join(UPLOAD_DIR, f"bench-{d}.docx")
+        open(path, "wb").close()  # process_document removes it when done
+        total_chunks += process_document(path, f"ingest-{uuid.uuid4()}", parse_executor=executor)
+    elapsed = time.perf_counter() - start
+
+    results = {
+        "documents": documents,
+        "chunks": total_chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_s": round(total_chunks / elapsed, 1),
+        "documents_per_s": round(documents / elapsed, 2),
+    }
+    _print(f"\n[ingest] {documents} documents x {articles} articles (parse stubbed)")
+    _print(f"{'process_document':<36} {results['chunks']} chunks in {elapsed:.2f} s = {results['chunks_per_s']:.1f} chunks/s")
+    return results
+
+@contextmanager
+def serve(app, port: int = 0):
+    """Run the app under uvicorn in a background thread; yields the base URL."""
+    import socket
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", port))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        sock.close()
+
+async def _analyze_once(client, headers, session_id, question):
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", "/analyze", json={"query": question, "session_id": session_id},
+                             headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if chunk and ttfb is None:
+                ttfb = time.perf_counter() - start
+    return ttfb * 1000, (time.perf_counter() - start) * 1000
+
+def bench_analyze(corpus: RetrievalCorpus, requests: int, concurrency: int):
+    import httpx
+    from backend.main import app
+
+    async def run(base_url):
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+            credentials = {"username": f"bench-{uuid.uuid4().hex[:8]}", "password": "benchmark-password"}
+            await client.post("/register", json=credentials)
+            token = (await client.post("/token", data=credentials)).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i):
+                async with semaphore:
+                    return await _analyze_once(client, headers, corpus.session_id, f"What are the payment terms ({i})?")
+
+            await one(-1)  # builds the agent
+            return await asyncio.gather(*(one(i) for i in range(requests)))
+
+    with serve(app) as base_url:
+        samples = asyncio.run(run(base_url))
+
+    results = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ttfb": _percentiles([ttfb for ttfb, _ in samples]),
+        "total": _percentiles([total for _, total in samples]),
+    }
+    _print(f"\n[analyze] {requests} requests, {concurrency} concurrent, stub model")
+    _report("time to first byte", results["ttfb"])
+    _report("full response", results["total"])
+    return results
+
+async def _stream_stalls(client, headers, session_id, question):
+    """
+    Time to first byte and the longest pause between two answer tokens of one /analyze
+    stream, in ms. The wait for the tool and the second model call is not a stall.
+    """
+    start = last = time.perf_counter()
+    ttfb, worst_gap, answering = None, 0.0, False
+    async with client.stream("POST", "/analyze", json={"query": question, "session_id": session_id},
+                             headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            now = time.perf_counter()
+            if ttfb is None:
+                ttfb = now - start
+            if answering:
+                worst_gap = max(worst_gap, now - last)
+            answering = b"Analyzing" not in chunk
+            last = now
+    return ttfb * 1000, worst_gap * 1000
+
+def bench_login(corpus: RetrievalCorpus, logins: int, streams: int, quiet_s: float, inline_bcrypt: bool):
+    """
+    Streams /analyze answers continuously, first alone for `quiet_s`, then while `logins`
+    concurrent /token requests hash passwords. With --inline-bcrypt, verification runs on
+    the event loop as it used to, to show what the bcrypt pool prevents.
+    """
+    import httpx
+    from backend.main import app
+    from backend.routers import auth
+    from backend.security import verify_password
+
+    async def run(base_url):
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            credentials = {"username": f"bench-{uuid.uuid4().hex[:8]}", "password": "benchmark-password"}
+            await client.post("/register", json=credentials)
+            headers = {"Authorization": f"Bearer {(await client.post('/token', data=credentials)).json()['access_token']}"}
+            await _stream_stalls(client, headers, corpus.session_id, "warm-up")  # builds the agent
+
+            async def stream_until(stop, samples):
+                i = 0
+                while not stop.is_set():
+                    samples.append(await _stream_stalls(client, headers, corpus.session_id, f"Payment terms ({i})?"))
+                    i += 1
+
+            async def phase(workload):
+                stop, samples = asyncio.Event(), []
+                streaming = [asyncio.create_task(stream_until(stop, samples)) for _ in range(streams)]
+                outcome = await workload()
+                stop.set()
+                await asyncio.gather(*streaming)
+                return samples, outcome
+
+            async def login():
+                start = time.perf_counter()
+                response = await client.post("/token", data=credentials)
+                return response.status_code, (time.perf_counter() - start) * 1000
+
+            quiet, _ = await phase(lambda: asyncio.sleep(quiet_s))
+            burst, attempts = await phase(lambda: asyncio.gather(*(login() for _ in range(logins))))
+            return quiet, burst, attempts
+
+    original = auth.verify_password_async
+    if inline_bcrypt:
+        async def verify_on_loop(*args):
+            return verify_password(*args)
+        auth.verify_password_async = verify_on_loop
+    try:
+        with serve(app) as base_url:
+            quiet, burst, attempts = asyncio.run(run(base_url))
+    finally:
+        auth.verify_password_async = original
+
+    accepted = [ms for code, ms in attempts if code == 200]
+    results = {
+        "logins": logins,
+        "streams": streams,
+        "inline_bcrypt": inline_bcrypt,
+        "quiet": {"ttfb": _percentiles([t for t, _ in quiet]), "max_gap": _percentiles([g for _, g in quiet])},
+        "burst": {"ttfb": _percentiles([t for t, _ in burst]), "max_gap": _percentiles([g for _, g in burst])},
+        "login": _percentiles(accepted) if accepted else None,
+        "login_status": {str(code): sum(1 for c, _ in attempts if c == code) for code in sorted({c for c, _ in attempts})},
+    }
+    mode = "on the event loop" if inline_bcrypt else "on the bcrypt pool"
+    _print(f"\n[login] {logins} concurrent logins, {streams} /analyze streams, bcrypt {mode}")
+    for name in ("quiet", "burst"):
+        _report(f"{name}: time to first byte", results[name]["ttfb"])
+        _report(f"{name}: longest pause between tokens", results[name]["max_gap"])
+    if accepted:
+        _report("login", results["login"])
+    _print(f"{'login responses':<36} {results['login_status']}")
+    return results
+
+# --- ENTRY POINT ---
+
+def _run_scenarios(args, results):
+    if "sqlite" in args.only:
+        results["sqlite"] = bench_sqlite(args.sessions, args.messages, args.calls)
+    corpus = RetrievalCorpus() if {"retrieval", "analyze", "login"} & set(args.only) else None
+    if "retrieval" in args.only:
+        results["retrieval"] = bench_retrieval(corpus, args.corpus, args.queries)
+    if "ingest" in args.only:
+        results["ingest"] = bench_ingest(args.documents, args.articles)
+    if "analyze" in args.only:
+        corpus.grow_to(max(corpus.size, 1_000))
+        results["analyze"] = bench_analyze(corpus, args.requests, args.concurrency)
+    if "login" in args.only:
+        corpus.grow_to(max(corpus.size, 1_000))
+        results["login"] = bench_login(corpus, args.logins, args.streams, args.quiet_s, args.inline_bcrypt)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite; emits JSON for regression tracking")
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--workdir", help="keep databases here instead of a temporary directory")
+    parser.add_argument("--calls", type=int, default=200, help="samples per SQLite operation")
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=2_000)
+    parser.add_argument("--corpus", type=int, nargs="+", default=[1_000, 10_000],
+                        help="corpus sizes in chunks; seeding is HNSW-bound, 1000000 takes tens of minutes")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--articles", type=int, default=40, help="title chunks per synthetic document")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=0.0, help="stub model latency before the first token")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="stub model delay between tokens")
+    parser.add_argument("--logins", type=int, default=40, help="concurrent /token requests in the login burst")
+    parser.add_argument("--streams", type=int, default=4, help="/analyze streams kept running during the login scenario")
+    parser.add_argument("--quiet-s", type=float, default=5.0, help="seconds of streaming without logins, for comparison")
+    parser.add_argument("--inline-bcrypt", action="store_true", help="login scenario: verify passwords on the event loop")
+    parser.add_argument("--verbose", action="store_true", help="keep the agent's and tools' own output")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="legalmind_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    configure_environment(workdir)
+    install_fakes(args.first_token_ms / 1000, args.token_ms / 1000)
+
+    results = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+    quiet = open(os.devnull, "w")
+    try:
+        with redirect_stdout(sys.stdout if args.verbose else quiet):
+            _run_scenarios(args, results)
+    finally:
+        quiet.close()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        _print(f"\nwrote {args.json}")
+
+if __name__ == "__main__":
+    main()
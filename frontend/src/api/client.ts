@@ -64,3 +64,15 @@ export const documents = {
     });
   }
 };
+
+export const jobs = {
+  get: (id: string) => api.get(`/jobs/${id}`),
+  // Poll an ingestion job until it leaves the queued/running states
+  waitFor: async (id: string, intervalMs = 1000) => {
+    while (true) {
+      const res = await api.get(`/jobs/${id}`);
+      if (res.data.status !== 'queued' && res.data.status !== 'running') return res.data;
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
+};
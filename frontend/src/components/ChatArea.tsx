@@ -2,7 +2,7 @@ import React, { useRef, useEffect, useState } from 'react';
 import { Send, Upload, Loader2, FileText, Edit2, RefreshCw, X } from 'lucide-react';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
-import { sessions as sessionApi, documents as docApi, API_BASE } from '../api/client';
+import { sessions as sessionApi, documents as docApi, jobs as jobApi, API_BASE } from '../api/client';
 
 // Types
 interface Message { role: 'user' | 'assistant'; content: string; }
@@ -56,7 +56,9 @@ export const ChatArea: React.FC<ChatAreaProps> = ({
     setIsUploading(true);
     try {
       const res = await docApi.upload(selectedFiles, targetId!);
-      const newFiles = res.data.uploaded
+      const job = res.data.job_id ? await jobApi.waitFor(res.data.job_id) : { files: [] };
+      // Deduplicated uploads are linked immediately; the rest come back from the job
+      const newFiles = [...res.data.uploaded.filter((u: any) => u.deduplicated), ...job.files]
         .filter((u: any) => u.status === 'Success')
         .map((u: any) => ({ file_id: u.file_id, filename: u.filename }));
       setFiles(prev => [...prev, ...newFiles]);